@@ -0,0 +1,120 @@
+# Startup and assets. Only the pygame modules the game uses are started, the
+# window comes up first, sounds are decoded on a background thread while the
+# start screen is already showing, and surfaces are converted to the pixel
+# format of the screen once so blitting them never has to convert pixels.
+from collections import OrderedDict
+import os
+import threading
+import time
+import pygame as pg
+from setting import *
+
+SOUND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Sounds')
+# sounds played by the game, keyed by the name they are played with
+SOUNDS = {'jump': 'block_jump.wav', 'hit': 'hit.wav', 'score': 'Pickup_Coin.wav'}
+
+
+def to_display(surface, colorkey=None):
+    """Convert a surface to the pixel format of the screen.
+
+    Surfaces that are only ever blitted from get their colorkey run-length
+    encoded, which makes blitting mostly see-through surfaces (clouds, cacti)
+    many times faster.
+
+    Args:
+        surface (Surface): surface to convert
+        colorkey (tuple): RGB color value treated as see-through, if any
+
+    Returns:
+        Surface: the converted surface, or surface itself if there is no screen yet
+    """
+    if colorkey is not None:
+        surface.set_colorkey(colorkey, pg.RLEACCEL)
+    if pg.display.get_surface() is None:
+        return surface
+    return surface.convert()
+
+
+class Assets(object):
+    """Assets starts pygame for the game and loads its sounds.
+
+    Args:
+        launch (float): time.perf_counter() when the program started, defaults to now
+
+    Attributes:
+        sounds (dict): decoded sounds keyed by name, filled in by a background thread
+        audio (bool): True if a sound device was opened
+        startup (OrderedDict): seconds from launch to the end of each startup step
+    """
+    def __init__(self, launch=None):
+        self.launch = time.perf_counter() if launch is None else launch
+        self.sounds = {}
+        self.audio = False
+        self.loader = None
+        self.startup = OrderedDict()
+
+    def mark(self, step):
+        '''Record that a startup step has just finished'''
+        self.startup[step] = time.perf_counter() - self.launch
+
+    def open_window(self, size, caption):
+        """Start the display and font modules and open the game window.
+
+        Args:
+            size (tuple): width and height of the window
+            caption (str): title of the window
+
+        Returns:
+            Surface: the screen
+        """
+        # pg.init() would also start the joystick and other modules the game never uses
+        pg.display.init()
+        pg.font.init()
+        screen = pg.display.set_mode(size)
+        pg.display.set_caption(caption)
+        self.mark('window')
+        return screen
+
+    def refresh_rate(self):
+        '''Return how many times a second the display refreshes, FPS if it cannot tell'''
+        # only pygame-ce can tell, with pygame itself RENDER_FPS has to be set by hand
+        rates = getattr(pg.display, 'get_desktop_refresh_rates', None)
+        rate = rates()[0] if rates is not None else 0
+        return rate if rate > 0 else FPS
+
+    def load_sounds(self, sounds=SOUNDS):
+        '''Open the sound device and decode the sounds in the background, only the first time'''
+        if self.loader is not None or 'sounds' in self.startup:
+            return
+        try:
+            pg.mixer.init()
+        except pg.error:
+            # no sound device, the game plays silently
+            self.mark('sounds')
+            return
+        self.audio = True
+        self.loader = threading.Thread(target=self.decode, args=(sounds,), name='sounds', daemon=True)
+        self.loader.start()
+
+    def decode(self, sounds):
+        '''Background thread: read and decode every sound file'''
+        for name, file_name in sounds.items():
+            self.sounds[name] = pg.mixer.Sound(os.path.join(SOUND_DIR, file_name))
+        self.mark('sounds')
+
+    def play(self, name):
+        '''Play a sound, unless it is not decoded yet or there is no sound device'''
+        sound = self.sounds.get(name)
+        if sound is not None:
+            sound.play()
+
+    def wait(self):
+        '''Block until every sound is decoded'''
+        if self.loader is not None:
+            self.loader.join()
+
+    def write_startup(self, path=STARTUP_LOG):
+        '''Append the startup timings to a log, one line per launch'''
+        with open(path, 'a') as outfile:
+            outfile.write('%s %s\n' % (time.strftime('%Y-%m-%dT%H:%M:%S'), ' '.join(
+                '%s=%.1fms' % (step, seconds * 1000) for step, seconds in self.startup.items())))
@@ -0,0 +1,203 @@
+# Batch simulation: thousands of independent games stepped at once with NumPy.
+# The rules are the same as in simulation.py, but every game is a row in a set
+# of arrays instead of a tree of objects, so one step() advances every game
+# with a handful of vectorized operations.
+import numpy as np
+from setting import *
+
+# pieces of a cactus, in the same order as CactusState.parts:
+# body, left arm, right arm, left arm bump, right arm bump
+PART_DX = np.array([0, -ARM_WIDTH, OBS_WIDTH, -ARM_WIDTH, OBS_WIDTH + ARM_WIDTH - 5])
+PART_W = np.array([OBS_WIDTH, ARM_WIDTH, ARM_WIDTH, 5, 5])
+# distance from the cactus x position to the right edge of the right arm
+CACTUS_RIGHT = OBS_WIDTH + ARM_WIDTH
+
+
+class BatchSimulation(object):
+    """BatchSimulation runs n games side by side as struct-of-arrays buffers.
+
+    Every game follows the rules of Simulation. Games draw their random numbers
+    from one NumPy generator, so a batch is reproducible for a given seed but
+    does not replay the same games as Simulation would. Only cacti are
+    generated: there are no birds, and groups are not checked against the
+    jump of the block the way LevelGenerator checks them. Games that end keep
+    their final state until they are reset.
+
+    Args:
+        n (int): number of games to run at once
+        seed (int): seed for the random number generator
+        capacity (int): number of cacti each game can hold at once
+
+    Attributes:
+        time (ndarray): simulated milliseconds since each game started
+        frame (ndarray): number of frames each game has been stepped
+        score (ndarray): score of each game
+        timer (ndarray): time the last group of cacti was generated
+        score_timer (ndarray): time the score was last incremented
+        obs_gen_time (ndarray): time inbetween cactus generations
+        speed (ndarray): distance each game's world scrolls each frame
+        scroll (ndarray): distance each game's world has scrolled
+        block_y (ndarray): y position of the bottom of each block
+        block_vel (ndarray): vertical velocity of each block
+        playing (ndarray): False once a game's block has hit an obstacle
+        obs_live (ndarray): (n, capacity) True for slots holding a cactus
+        obs_x (ndarray): (n, capacity) world x location of each cactus body
+        obs_y (ndarray): (n, capacity, 5) top of each piece of each cactus
+        obs_h (ndarray): (n, capacity, 5) height of each piece of each cactus
+        head (ndarray): next slot each game writes a cactus to
+    """
+    def __init__(self, n, seed=None, capacity=16):
+        self.n = n
+        self.capacity = capacity
+        self.rng = np.random.default_rng(seed)
+        self.time = np.zeros(n)
+        self.frame = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.timer = np.zeros(n)
+        self.score_timer = np.zeros(n)
+        self.obs_gen_time = np.zeros(n, dtype=np.int64)
+        self.speed = np.zeros(n, dtype=np.int64)
+        self.scroll = np.zeros(n, dtype=np.int64)
+        self.block_y = np.zeros(n)
+        self.block_vel = np.zeros(n)
+        self.playing = np.zeros(n, dtype=bool)
+        self.obs_live = np.zeros((n, capacity), dtype=bool)
+        self.obs_x = np.zeros((n, capacity), dtype=np.int64)
+        self.obs_y = np.zeros((n, capacity, 5), dtype=np.int64)
+        self.obs_h = np.zeros((n, capacity, 5), dtype=np.int64)
+        self.head = np.zeros(n, dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        """Start new games.
+
+        Args:
+            mask (ndarray): boolean array picking the games to restart, all games if None
+        """
+        if mask is None:
+            mask = np.ones(self.n, dtype=bool)
+        self.time[mask] = 0.0
+        self.frame[mask] = 0
+        self.score[mask] = 0
+        self.timer[mask] = 0
+        self.score_timer[mask] = 0
+        self.obs_gen_time[mask] = OBS_GEN_TIME
+        self.speed[mask] = OBS_VELOCITY
+        self.scroll[mask] = 0
+        self.block_y[mask] = GROUND_Y
+        self.block_vel[mask] = 0.0
+        self.playing[mask] = True
+        self.obs_live[mask] = False
+        self.head[mask] = 0
+
+    @property
+    def block_bottom(self):
+        '''Bottom of each block in whole pixels'''
+        return np.floor(self.block_y + 0.5).astype(np.int64)
+
+    def step(self, jump):
+        """Advance every game that is still playing by one frame.
+
+        Args:
+            jump (ndarray): per game True if the jump key is held, or a single bool for all games
+
+        Returns:
+            ndarray: the playing mask after the step
+        """
+        active = self.playing.copy()
+        jump = np.broadcast_to(np.asarray(jump, dtype=bool), (self.n,)) & active
+        self.frame += active
+        self.time += active * FRAME_TIME
+
+        # Jumping is only possible from the ground (keeps from double jumping)
+        bottom = self.block_bottom + 1
+        on_ground = (bottom > GROUND_Y) & (bottom - BLOCK_HEIGHT < GROUND_Y + 2)
+        self.block_vel[jump & on_ground] = PLAYER_JUMP
+
+        self.move(jump, active)
+        self.collide(active)
+        self.spawn(active)
+        self.tally(active)
+        return self.playing
+
+    def move(self, jump, active):
+        '''Scroll the worlds under the blocks and move the blocks under gravity'''
+        # velocity goes up by one every OBS_VEL_CHNG_RT points
+        self.speed = np.where(active, OBS_VELOCITY + self.score // OBS_VEL_CHNG_RT, self.speed)
+        self.scroll += active * self.speed
+
+        self.block_vel += jump * ANTIGRAVITY
+        self.block_vel += active * GRAVITY
+        self.block_y += active * (self.block_vel + 0.5*GRAVITY)
+
+        # Land on the ground platform (2 pixels tall, starting at GROUND_Y)
+        bottom = self.block_bottom
+        landed = active & (bottom > GROUND_Y) & (bottom - BLOCK_HEIGHT < GROUND_Y + 2)
+        self.block_y[landed] = GROUND_Y
+        self.block_vel[landed] = 0.0
+
+    def collide(self, active):
+        '''End games on contact and drop cacti that scrolled off screen'''
+        # block position in each game's world coordinates
+        block_left = (BLOCK_X - BLOCK_WIDTH//2 + self.scroll)[:, None]
+        # broad phase: only cacti whose arms span the block's columns can touch it
+        near = (self.obs_live & active[:, None]
+                & (self.obs_x - ARM_WIDTH < block_left + BLOCK_WIDTH)
+                & (self.obs_x + CACTUS_RIGHT > block_left))
+        games, slots = np.nonzero(near)
+        if len(games):
+            # AABB test of every piece of the nearby cacti against the block
+            bottom = self.block_bottom[games, None]
+            left = self.obs_x[games, slots, None] + PART_DX
+            top = self.obs_y[games, slots]
+            block_left = block_left[games]
+            hits = ((left < block_left + BLOCK_WIDTH) & (left + PART_W > block_left)
+                    & (top < bottom)
+                    & (top + self.obs_h[games, slots] > bottom - BLOCK_HEIGHT))
+            self.playing[games[hits.any(axis=1)]] = False
+
+        self.obs_live &= ~(active[:, None] & (self.obs_x + CACTUS_RIGHT < self.scroll[:, None]))
+
+    def spawn(self, active):
+        '''Generate new groups of cacti off screen as time goes by'''
+        # Every 200 game points reduct time inbetween cactus generations up to a limit of 700ms
+        faster = active & (self.score % 200 == 0) & (self.obs_gen_time > OBS_GEN_TIME_MIN)
+        self.obs_gen_time -= faster * 50
+
+        due = np.flatnonzero(active & (self.time - self.timer > self.obs_gen_time))
+        if not len(due):
+            return
+        k = len(due)
+        obs_x_pos = self.rng.integers(WIDTH, WIDTH + 101, size=k) + self.scroll[due]
+        # Generate obstacles in groups 0-3 spaced apart by amt spacing.
+        count = self.rng.integers(1, 5, size=k) - 1
+        for n in range(3):
+            games = due[count > n]
+            if not len(games):
+                break
+            m = len(games)
+            obs_height = self.rng.integers(50, 80, size=m)
+            # arms sit at 1/2 or 2/3 of the height, bumps above or below the arm
+            arm_y_pos = np.stack([OBS_Y_POS - np.round(obs_height * 2/3),
+                                  OBS_Y_POS - np.round(obs_height * 1/2)]).astype(np.int64)
+            l_choose = arm_y_pos[self.rng.integers(0, 2, size=m), np.arange(m)]
+            r_choose = arm_y_pos[self.rng.integers(0, 2, size=m), np.arange(m)]
+            l_bump = l_choose + np.where(self.rng.integers(0, 2, size=m), 5, -ARM_HEIGHT)
+            r_bump = r_choose + np.where(self.rng.integers(0, 2, size=m), 5, -ARM_HEIGHT)
+
+            slot = (self.head[games] + n) % self.capacity
+            self.obs_live[games, slot] = True
+            self.obs_x[games, slot] = obs_x_pos[count > n] + OBS_SPACING * n
+            self.obs_y[games, slot] = np.stack([OBS_Y_POS - obs_height, l_choose - ARM_HEIGHT,
+                                                r_choose - ARM_HEIGHT, l_bump - 5, r_bump - 5], axis=1)
+            self.obs_h[games, slot] = np.stack([obs_height, np.full(m, ARM_HEIGHT),
+                                                np.full(m, ARM_HEIGHT), np.full(m, 5),
+                                                np.full(m, 5)], axis=1)
+        self.head[due] = (self.head[due] + count) % self.capacity
+        self.timer[due] = self.time[due]
+
+    def tally(self, active):
+        '''Score is based on game survival time'''
+        scored = active & (self.time - self.score_timer > 100)
+        self.score += scored
+        self.score_timer[scored] = self.time[scored]
@@ -0,0 +1,252 @@
+# Frame time benchmarks. Runs the game with the dummy SDL video and audio
+# drivers (no window, no sound) and scripted input through a set of fixed
+# scenarios, then writes per-phase frame times to a JSON file so results can
+# be compared between commits.
+#
+#   python benchmark.py --output before.json
+#   python benchmark.py --output after.json --compare before.json
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+from array import array
+import gc
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import pygame as pg
+from setting import *
+from main import Game
+
+PHASES = ('events', 'update', 'draw', 'frame')
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, q):
+    '''Return the q-th percentile (nearest rank) of a sorted list'''
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def script(frame):
+    '''Scripted input: hold the jump key for 20 frames out of every 60'''
+    return frame % 60 < 20
+
+
+def empty_field(game):
+    '''No obstacles are ever generated'''
+    game.sim.timer = float('inf')
+
+
+def peak_density(game):
+    '''Obstacles are generated as often as they ever will be'''
+    game.sim.score = 1010
+    game.sim.obs_gen_time = OBS_GEN_TIME_MIN
+
+
+def velocity_ramp(score):
+    '''Start just before the obstacle velocity goes up at score'''
+    def setup(game):
+        game.sim.score = score - 10
+        game.sim.obs_gen_time = max(OBS_GEN_TIME_MIN, OBS_GEN_TIME - 50 * (score // 200))
+    setup.__doc__ = 'Obstacle velocity goes up at score %d' % score
+    return setup
+
+
+SCENARIOS = [
+    ('empty_field', empty_field),
+    ('peak_density', peak_density),
+    ('velocity_200', velocity_ramp(200)),
+    ('velocity_400', velocity_ramp(400)),
+    ('velocity_800', velocity_ramp(800)),
+]
+
+
+def run_scenario(game, setup, frames):
+    """Play a scenario for a number of frames and time every phase of every frame.
+
+    The block is not invincible; when it hits an obstacle the scenario starts
+    over and keeps counting frames.
+
+    Args:
+        game (Game): game to drive
+        setup (callable): puts a freshly reset game into the scenario
+        frames (int): number of frames to play
+
+    Returns:
+        dict: percentiles per phase, sprite counts, and net block growth and garbage collections per frame
+    """
+    # preallocated so that recording timings does not allocate anything itself
+    timings = {phase: array('d', [0.0]) * frames for phase in PHASES}
+    sprites = array('l', [0]) * frames
+    restarts = 0
+    game.controller = lambda game: script(game.sim.frame)
+    game.reset()
+    setup(game)
+    game.playing = True
+    gc.collect()
+    collections = sum(stat['collections'] for stat in gc.get_stats())
+    blocks = sys.getallocatedblocks()
+
+    for n in range(frames):
+        if not game.playing:
+            restarts += 1
+            game.reset()
+            setup(game)
+            game.playing = True
+        start = time.perf_counter()
+        game.events()
+        events = time.perf_counter()
+        game.update()
+        update = time.perf_counter()
+        game.draw()
+        draw = time.perf_counter()
+        timings['events'][n] = (events - start) * 1000
+        timings['update'][n] = (update - events) * 1000
+        timings['draw'][n] = (draw - update) * 1000
+        timings['frame'][n] = (draw - start) * 1000
+        sprites[n] = len(game.all_sprites)
+
+    blocks = sys.getallocatedblocks() - blocks
+    collections = sum(stat['collections'] for stat in gc.get_stats()) - collections
+    game.controller = None
+
+    result = {'frames': frames, 'restarts': restarts}
+    for phase, values in timings.items():
+        values = sorted(values)
+        result[phase] = {'p%d' % q: round(percentile(values, q), 4) for q in PERCENTILES}
+        result[phase]['mean'] = round(sum(values) / len(values), 4)
+    result['sprites'] = {'mean': round(sum(sprites) / len(sprites), 2), 'max': max(sprites)}
+    # live Python memory blocks at the end minus at the start, per frame: this
+    # shows leaks, not allocations (a block freed in the same frame never counts)
+    result['net_block_growth_per_frame'] = round(blocks / frames, 3)
+    result['gc_collections_per_frame'] = round(collections / frames, 4)
+    return result
+
+
+def run_idle(game, seconds):
+    """Time drawing the start screen and measure CPU use while it sits idle.
+
+    Args:
+        game (Game): game to drive
+        seconds (float): how long to leave the start screen up
+
+    Returns:
+        dict: time to draw the start screen and CPU use while idle
+    """
+    start = time.perf_counter()
+    game.render_start_screen()
+    render = time.perf_counter() - start
+    # press the spacebar from another thread once the time is up
+    timer = threading.Timer(seconds, pg.event.post, [pg.event.Event(pg.KEYDOWN, key=pg.K_SPACE)])
+    cpu = time.process_time()
+    wall = time.perf_counter()
+    timer.start()
+    game.show_start_screen()
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    return {'render_ms': round(render * 1000, 4),
+            'idle_seconds': round(wall, 3),
+            'cpu_percent': round(100 * cpu / wall, 2)}
+
+
+def run_startup(runs):
+    """Launch the game in a fresh interpreter a few times and time how long the start screen takes.
+
+    Args:
+        runs (int): number of launches
+
+    Returns:
+        dict: median seconds from launch to the end of each startup step, and wall time per launch
+    """
+    main = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    steps = {}
+    walls = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        # run somewhere else so the launches leave no leaderboard or log files behind
+        with tempfile.TemporaryDirectory() as directory:
+            output = subprocess.check_output([sys.executable, main, '--startup'], cwd=directory,
+                                             env=env, stderr=subprocess.DEVNULL)
+        walls.append(time.perf_counter() - start)
+        for step, seconds in json.loads(output.decode().splitlines()[-1]).items():
+            steps.setdefault(step, []).append(seconds)
+    result = {step + '_ms': round(percentile(sorted(values), 50) * 1000, 2) for step, values in steps.items()}
+    result['process_ms'] = round(percentile(sorted(walls), 50) * 1000, 2)
+    return result
+
+
+def git_commit():
+    '''Return the commit being benchmarked, if this is a git checkout'''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    '''Print the change in p50 and p99 frame time of every scenario'''
+    print('%-16s %-8s %10s %10s %8s' % ('scenario', 'phase', 'old ms', 'new ms', 'change'))
+    for name, result in new['scenarios'].items():
+        if name not in old['scenarios'] or 'frame' not in result:
+            continue
+        for phase in PHASES:
+            for q in ('p50', 'p99'):
+                before = old['scenarios'][name][phase][q]
+                after = result[phase][q]
+                change = (after - before) / before * 100 if before else 0.0
+                print('%-16s %-8s %10.4f %10.4f %+7.1f%%' % (name, phase + ' ' + q, before, after, change))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure frame times of BLOCK RUN.')
+    parser.add_argument('--frames', type=int, default=2000, help='frames to play per scenario')
+    parser.add_argument('--idle', type=float, default=2.0, help='seconds to idle on the start screen')
+    parser.add_argument('--launches', type=int, default=5, help='cold launches timed for the startup scenario')
+    parser.add_argument('--output', default='benchmark.json', help='file to write the results to')
+    parser.add_argument('--compare', help='earlier results file to compare against')
+    parser.add_argument('--scenario', action='append', help='only run the named scenario(s)')
+    args = parser.parse_args(argv)
+
+    game = Game()
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pygame': pg.version.ver,
+        'dirty_rects': DIRTY_RECTS,
+        'scenarios': {},
+    }
+    for name, setup in SCENARIOS:
+        if args.scenario and name not in args.scenario:
+            continue
+        result = results['scenarios'][name] = run_scenario(game, setup, args.frames)
+        print('%-16s frame p50 %.3f ms  p99 %.3f ms  sprites %.1f' % (
+            name, result['frame']['p50'], result['frame']['p99'], result['sprites']['mean']))
+    if not args.scenario or 'start_screen' in args.scenario:
+        result = results['scenarios']['start_screen'] = run_idle(game, args.idle)
+        print('%-16s render %.3f ms  idle cpu %.1f%%' % ('start_screen', result['render_ms'],
+                                                          result['cpu_percent']))
+    pg.quit()
+    if not args.scenario or 'startup' in args.scenario:
+        result = results['scenarios']['startup'] = run_startup(args.launches)
+        print('%-16s start screen %.1f ms  process %.1f ms' % ('startup', result['start_screen_ms'],
+                                                              result['process_ms']))
+
+    with open(args.output, 'w') as outfile:
+        json.dump(results, outfile, indent=2)
+    if args.compare:
+        with open(args.compare) as infile:
+            compare(json.load(infile), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+# Reinforcement learning environment. Follows the Gym API (reset() returns
+# observation and info, step() returns observation, reward, terminated,
+# truncated and info) without depending on gym itself. This requires NumPy
+# (`pip install numpy`).
+#
+#   env = BlockRunEnv()
+#   observation, info = env.reset(seed=1)
+#   while True:
+#       observation, reward, terminated, truncated, info = env.step(policy(observation))
+#       if terminated or truncated:
+#           break
+import os
+# pixel observations are drawn off screen, no window or sound needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame as pg
+from setting import *
+from simulation import Simulation
+
+MODES = ('features', 'pixels')
+# features that describe the block: y position of its bottom and vertical velocity
+BLOCK_FEATURES = 2
+# features that describe each obstacle: distance ahead of the block, width and height
+# (a bird's height is its own, not how high it flies)
+OBSTACLE_FEATURES = 3
+
+
+class BlockRunEnv(object):
+    """BlockRunEnv lets an agent play the game one frame at a time.
+
+    The action is 1 to hold the jump key during the frame and 0 to let go. The
+    reward is 1 for every frame survived and the episode ends when the block
+    hits an obstacle.
+
+    In 'features' mode the game runs on a bare Simulation and the observation
+    is a float32 vector: the bottom y position and vertical velocity of the
+    block, then for each of the nearest k obstacles ahead of it the distance
+    from the front of the block to the obstacle, its width and its height.
+    Missing obstacles are WIDTH away with no width or height.
+
+    In 'pixels' mode the game is drawn by a Game into a surface whose pixels
+    live in a NumPy array, and the observation is a (height, width, 3) uint8
+    RGB view of that array taking every downsample-th pixel in each direction.
+    No pixels are copied. (A pg.surfarray.pixels3d view would lock the screen
+    for as long as the agent holds on to it, and pygame cannot draw on a
+    locked surface.)
+
+    Either way the observation is overwritten by the next step(), so copy it
+    to keep it.
+
+    Args:
+        mode (str): 'features' or 'pixels'
+        k (int): number of obstacles in a feature vector
+        downsample (int): keep every downsample-th pixel of pixel observations
+        max_frames (int): episodes are truncated after this many frames, None for no limit
+
+    Attributes:
+        observation_shape (tuple): shape of the observations
+        observation_dtype (dtype): type of the observations
+        n_actions (int): number of actions (0: let go of jump, 1: hold jump)
+        sim (Simulation): state of the game being played
+        game (Game): game drawing the pixels, None in features mode
+    """
+    n_actions = 2
+
+    def __init__(self, mode='features', k=3, downsample=1, max_frames=None):
+        if mode not in MODES:
+            raise ValueError('mode must be one of %s, not %r' % (', '.join(MODES), mode))
+        self.mode = mode
+        self.k = k
+        self.downsample = downsample
+        self.max_frames = max_frames
+        self.sim = None
+        self.game = None
+        if mode == 'features':
+            # filled in place every step, so building an observation allocates nothing
+            self.features = np.zeros(BLOCK_FEATURES + OBSTACLE_FEATURES*k, dtype=np.float32)
+            self.observation_shape = self.features.shape
+            self.observation_dtype = self.features.dtype
+        else:
+            # imported here so features mode never touches the display
+            from main import Game
+            self.game = Game()
+            self.game.controller = lambda game: self.action
+            self.action = False
+            # the game draws straight into this array, in the byte order of the screen
+            self.frame_buffer = np.zeros((HEIGHT, WIDTH, 4), dtype=np.uint8)
+            self.game.screen = pg.image.frombuffer(self.frame_buffer, (WIDTH, HEIGHT), 'BGRA')
+            # every downsample-th pixel, with the channels flipped from BGR to RGB
+            self.pixels = self.frame_buffer[::downsample, ::downsample, 2::-1]
+            self.observation_shape = self.pixels.shape
+            self.observation_dtype = self.pixels.dtype
+
+    def reset(self, seed=None):
+        """Start a new episode.
+
+        Args:
+            seed (int): seed of the game, picked at random if None
+
+        Returns:
+            tuple: (observation, info)
+        """
+        if self.game is None:
+            if self.sim is None:
+                self.sim = Simulation(seed)
+            else:
+                self.sim.reset(seed)
+        else:
+            self.game.reset(seed)
+            self.game.playing = True
+            self.sim = self.game.sim
+            self.game.draw()
+        return self.observe(), self.info()
+
+    def step(self, action):
+        """Play one frame.
+
+        Args:
+            action (int): 1 to hold the jump key, 0 to let go
+
+        Returns:
+            tuple: (observation, reward, terminated, truncated, info)
+        """
+        if self.game is None:
+            self.sim.step(bool(action))
+        else:
+            self.action = bool(action)
+            # events() also keeps the event queue from filling up
+            self.game.events()
+            self.game.update()
+            self.game.draw()
+        terminated = not self.sim.playing
+        truncated = not terminated and self.max_frames is not None and self.sim.frame >= self.max_frames
+        return self.observe(), 0.0 if terminated else 1.0, terminated, truncated, self.info()
+
+    def observe(self):
+        '''Return the observation of the current frame'''
+        if self.game is not None:
+            return self.pixels
+
+        sim = self.sim
+        features = self.features
+        features[0] = sim.block_y
+        features[1] = sim.block_vel
+        # world x position of the front of the block
+        front = BLOCK_X - BLOCK_WIDTH//2 + BLOCK_WIDTH + sim.scroll
+        ahead = sim.nearby(front - BLOCK_WIDTH, sim.scroll + 2*WIDTH)
+        n = BLOCK_FEATURES
+        for obstacle in ahead[:self.k]:
+            features[n] = obstacle.left - front
+            features[n + 1] = obstacle.right - obstacle.left
+            features[n + 2] = obstacle.bottom - obstacle.top
+            n += OBSTACLE_FEATURES
+        # no obstacle in the remaining slots
+        features[n::OBSTACLE_FEATURES] = WIDTH
+        features[n + 1::OBSTACLE_FEATURES] = 0.0
+        features[n + 2::OBSTACLE_FEATURES] = 0.0
+        return features
+
+    def info(self):
+        '''Return details of the game that are not part of the observation'''
+        return {'seed': self.sim.seed, 'frame': self.sim.frame, 'score': self.sim.score}
+
+    def close(self):
+        '''Stop the game drawing pixel observations'''
+        if self.game is not None:
+            self.game.leaderboard.close()
+            pg.quit()
+            self.game = None
@@ -0,0 +1,579 @@
+# Jump arcs. The block's jump only depends on PLAYER_JUMP, GRAVITY,
+# ANTIGRAVITY and how many frames the jump key is held, so the height of
+# every possible jump on every frame is worked out once into a table. The
+# table answers which jumps get past a group of obstacles without stepping a
+# Simulation: the level generator uses it to only hand out groups that can be
+# cleared, and the Autopilot uses it to play the game.
+#
+#   python jumparc.py
+#
+# checks the ways past a few groups of obstacles frame by frame.
+import argparse
+import bisect
+from functools import lru_cache
+import itertools
+import sys
+from setting import *
+# imported as a module, simulation.py imports this one (through levelgen) as well
+import simulation
+
+# a window of takeoff distances that is open to the right
+FAR = float('inf')
+# frames after which a jump arc is given up on (the settings make the block float away)
+MAX_AIR_FRAMES = 10 * FPS
+# clusters of obstacles ahead the Autopilot plans its jumps over
+LOOKAHEAD = 3
+
+
+def jump_arcs(gravity, antigravity, player_jump):
+    """Work out every jump the block can make, the same way Simulation moves it.
+
+    Args:
+        gravity (float): GRAVITY setting
+        antigravity (float): ANTIGRAVITY setting
+        player_jump (float): PLAYER_JUMP setting
+
+    Returns:
+        list: for every number of frames the jump key is held (1 up to the
+              longest useful hold), the height of the bottom of the block above
+              the ground on each frame, starting with 0 on the frame before takeoff.
+              The block is back on the ground on the frame after the last height.
+    """
+    arcs = []
+    for hold in itertools.count(1):
+        y = float(GROUND_Y)
+        vel = player_jump
+        heights = [0]
+        for frame in range(1, MAX_AIR_FRAMES):
+            if frame <= hold:
+                vel += antigravity
+            vel += gravity
+            y += vel + 0.5*gravity
+            bottom = simulation.to_pixel(y)
+            if bottom > GROUND_Y and bottom - BLOCK_HEIGHT < GROUND_Y + 2:
+                break
+            heights.append(GROUND_Y - bottom)
+        # holding past the landing only makes the block jump again
+        if hold >= len(heights):
+            return arcs
+        arcs.append(heights)
+
+
+def edges(boxes):
+    """Pick out the obstacles that decide when a jump has to clear a group.
+
+    A box further left that is at least as high makes the block take off
+    earlier than this one does, and one further right that is at least as high
+    keeps it in the air longer, so only the remaining boxes need checking.
+
+    Args:
+        boxes (list): (left, right, low, high) of the obstacles, see JumpTable.options()
+
+    Returns:
+        tuple: (left, high) of the boxes deciding the earliest takeoff and
+               (right, high) of those deciding the latest, highest first
+    """
+    lefts = []
+    rights = []
+    for left, right, low, high in sorted(boxes, key=lambda box: -box[3]):
+        if not lefts or left < lefts[-1][0]:
+            lefts.append((left, high))
+        if not rights or right > rights[-1][0]:
+            rights.append((right, high))
+    return lefts, rights
+
+
+class JumpTable(object):
+    """JumpTable holds the height of every jump of the block on every frame.
+
+    Distances are measured from the front of the block to the x position of a
+    group of obstacles, on the last frame the block is on the ground before it
+    jumps.
+
+    Args:
+        gravity (float): GRAVITY setting
+        antigravity (float): ANTIGRAVITY setting
+        player_jump (float): PLAYER_JUMP setting
+
+    Attributes:
+        arcs (list): heights of the jump for every number of frames the jump key
+                     is held, see jump_arcs(); arcs[hold - 1] is the jump held for hold frames
+        reach (list): for every jump, the first and last frame it is at least
+                      each height above the ground, indexed by height up to its peak
+        order (list): hold of every jump, lowest peak first
+        rising (list): for every height, the frame before each jump in order
+                       is at least that high (-1 for jumps that never get there)
+        falling (list): for every height, the frame after the last one each
+                        jump in order is at least that high
+        reaching (list): for every height, the first jump in order that gets there
+    """
+    def __init__(self, gravity, antigravity, player_jump):
+        self.arcs = jump_arcs(gravity, antigravity, player_jump)
+        self.reach = []
+        for arc in self.arcs:
+            # a jump only goes up and then down, so both ends move inwards as the height goes up
+            first, last = 0, len(arc) - 1
+            firsts, lasts = [], []
+            for height in range(max(arc) + 1):
+                while arc[first] < height:
+                    first += 1
+                while arc[last] < height:
+                    last -= 1
+                firsts.append(first)
+                lasts.append(last)
+            self.reach.append((firsts, lasts))
+        # the same frames by height, with the jumps ordered by how high they go:
+        # the jumps that get over a box are then the tail of every row, and
+        # options() handles all of them with one slice
+        self.order = sorted(range(1, len(self.arcs) + 1), key=lambda hold: len(self.reach[hold - 1][0]))
+        reach = [self.reach[hold - 1] for hold in self.order]
+        peak = len(reach[-1][0]) if reach else 0
+        self.rising = [[firsts[height] - 1 if height < len(firsts) else -1 for firsts, _ in reach]
+                       for height in range(peak)]
+        self.falling = [[lasts[height] + 1 if height < len(lasts) else 0 for _, lasts in reach]
+                        for height in range(peak)]
+        self.reaching = [next(n for n, (firsts, _) in enumerate(reach) if height < len(firsts))
+                         for height in range(peak)]
+        self.lengths = [len(self.arcs[hold - 1]) for hold in self.order]
+        # holding longer normally always jumps higher, then the order is already by hold
+        self.by_hold = self.order == sorted(self.order)
+
+    def height(self, hold, frame):
+        '''Return how high the block is frame frames after taking off with the jump key held for hold frames'''
+        arc = self.arcs[hold - 1]
+        return arc[frame] if frame < len(arc) else 0
+
+    def options(self, boxes, speed):
+        """Find every way of getting past a group of obstacles at a speed.
+
+        Args:
+            boxes (list): (left, right, low, high) of every obstacle (or piece of
+                          one), x relative to the x position of the group and
+                          heights measured up from the ground
+            speed (int): distance the world scrolls each frame
+
+        Returns:
+            list: (lo, hi, free, hold) for every way past the group: the group
+                  must be between lo and hi away when the block takes off with
+                  the jump key held for hold frames (0 for staying on the
+                  ground), and the block can take off again once the group is
+                  free away (taking off on the first frame it is at most hi away)
+        """
+        if not boxes:
+            # nothing to get past
+            return [(-FAR, FAR, FAR, 0)]
+        ceilings = [box for box in boxes if box[2] >= BLOCK_HEIGHT]
+        if len(ceilings) == len(boxes):
+            # obstacles the block fits under: stay on the ground until they have gone by
+            right = max(box[1] for box in ceilings)
+            return [(-min(box[0] for box in ceilings), FAR, -right - BLOCK_WIDTH - speed + 1, 0)]
+        if ceilings:
+            boxes = [box for box in boxes if box[2] < BLOCK_HEIGHT]
+        lefts, rights = edges(boxes)
+        top = lefts[0][1]
+        if top >= len(self.reaching):
+            return []
+        # only the jumps that get as high as the highest box, all of them at
+        # once (this runs for every group the level generator checks)
+        first = self.reaching[top]
+        # too low until the frame after rising[high] and again from falling[high] on
+        los = None
+        for left, high in lefts:
+            starts = [frame*speed - left for frame in self.rising[high][first:]]
+            los = starts if los is None else list(map(max, los, starts))
+        his = None
+        for right, high in rights:
+            ends = [frame*speed - right - BLOCK_WIDTH for frame in self.falling[high][first:]]
+            his = ends if his is None else list(map(min, his, ends))
+        # the group only comes closer speed at a time, so a narrower
+        # window can fall between two frames
+        found = [(lo, hi, hi - (speed - 1) - length*speed, hold)
+                 for hold, length, lo, hi in zip(self.order[first:], self.lengths[first:], los, his)
+                 if hi - lo >= speed - 1]
+        if ceilings:
+            found = self.duck(found, ceilings, speed)
+        if not self.by_hold:
+            found.sort(key=lambda option: option[3])
+        return found
+
+    def duck(self, found, ceilings, speed):
+        """Narrow ways past obstacles on the ground down to the ones that do not hit any overhead.
+
+        While the block is in the air above an overhead obstacle's bottom, the
+        obstacle must either have gone by already or still be ahead; otherwise
+        the block has to get over the top of it.
+
+        Args:
+            found (list): ways past the obstacles on the ground, see options()
+            ceilings (list): (left, right, low, high) of the obstacles the block fits under
+            speed (int): distance the world scrolls each frame
+
+        Returns:
+            list: what is left of found, a way past may be split in two
+        """
+        # the block can only take off again once it no longer runs into them
+        later = -max(box[1] for box in ceilings) - BLOCK_WIDTH - speed + 1
+        for left, right, low, high in ceilings:
+            # from this height on the block hits the bottom of the obstacle
+            top = low - BLOCK_HEIGHT + 1
+            narrowed = []
+            for lo, hi, free, hold in found:
+                firsts, lasts = self.reach[hold - 1]
+                if top >= len(firsts):
+                    # never gets that high
+                    narrowed.append((lo, hi, free, hold))
+                    continue
+                # gone by before the block gets too high, or still ahead until it comes back down
+                windows = [(-FAR, firsts[top]*speed - right - BLOCK_WIDTH), (lasts[top]*speed - left, FAR)]
+                if high < len(firsts):
+                    # or over the top of it, the same as an obstacle on the ground
+                    windows.append(((firsts[high] - 1)*speed - left, (lasts[high] + 1)*speed - right - BLOCK_WIDTH))
+                pieces = []
+                for start, end in sorted(windows):
+                    start, end = max(lo, start), min(hi, end)
+                    if pieces and start <= pieces[-1][1] + 1:
+                        pieces[-1][1] = max(pieces[-1][1], end)
+                    elif end >= start:
+                        pieces.append([start, end])
+                length = len(self.arcs[hold - 1])
+                narrowed.extend((start, end, min(end - (speed - 1) - length*speed, later), hold)
+                                for start, end in pieces if end - start >= speed - 1)
+            found = narrowed
+        return found
+
+
+@lru_cache(maxsize=16)
+def jump_table(gravity, antigravity, player_jump):
+    '''Return the JumpTable of a set of jump settings, built only the first time'''
+    return JumpTable(gravity, antigravity, player_jump)
+
+
+class Autopilot(object):
+    """Autopilot plays the game by looking its jumps up in the JumpTable.
+
+    While the block is on the ground it splits the obstacles ahead into
+    clusters (obstacles too close together to land in between) and works out
+    once, frame by frame, when to jump over each of the next LOOKAHEAD
+    clusters: over every cluster it takes the jump that lands soonest while
+    still leaving a way past the clusters after it, or one jump over several
+    clusters at once when there is no landing in between. How far the world
+    scrolls on each frame to come is known from the clock and the score, so
+    speeding up in the middle of a jump is taken into account. Each frame
+    after that only compares the frame number, so deciding costs the same
+    however long the game runs.
+
+    Called with a Simulation, it returns whether to hold the jump key during
+    the next step, the same as a policy in tournament.py.
+
+    Attributes:
+        table (JumpTable): jumps of the settings of the game being played
+        hold (int): frames left to hold the jump key in the jump under way
+        cluster (object): first obstacle of the cluster the jump was worked out for
+        takeoff (int): frame on which to jump, None to stay on the ground
+        jump (int): frames to hold the jump key for when taking off
+        clusters (list): (distance, boxes) of the clusters ahead, see plan()
+        scrolls (list): distance the world scrolls from now until each frame to come
+        stretches (list): [first frame, frame past the end, speed] of every stretch of frames at one speed
+        found (dict): ways past clusters, see JumpTable.options(), keyed by (cluster, span, speed)
+        settled (bool): False if the block has only just landed and is not quite on the ground yet
+    """
+    def __init__(self):
+        self.table = None
+        self.hold = 0
+        self.cluster = None
+        self.takeoff = None
+        self.jump = 0
+        self.clusters = []
+        self.scrolls = []
+        self.stretches = []
+        self.found = {}
+        self.merges = {}
+        self.settled = True
+
+    def __call__(self, sim):
+        if self.hold:
+            # in the middle of a jump, keep holding for as long as planned
+            self.hold -= 1
+            return True
+        if not sim.on_ground():
+            return False
+        if self.table is None:
+            self.table = jump_table(sim.gravity, sim.antigravity, sim.player_jump)
+
+        # world x position of the front of the block
+        front = BLOCK_X - BLOCK_WIDTH//2 + BLOCK_WIDTH + sim.scroll
+        ahead = sim.nearby(front - BLOCK_WIDTH, sim.scroll + 2*WIDTH)
+        if not ahead:
+            return False
+        # plan again once the cluster has been dealt with, or when obstacles show up
+        # that are among the clusters planned for
+        if (ahead[0] is not self.cluster or (sim.spawned and len(self.clusters) < LOOKAHEAD)
+                or (self.takeoff is not None and sim.frame > self.takeoff)):
+            self.plan(sim, ahead, front)
+        if sim.frame != self.takeoff:
+            return False
+        self.hold = self.jump - 1
+        return True
+
+    def plan(self, sim, ahead, front):
+        """Work out when to jump over the cluster of obstacles at the front of ahead.
+
+        Args:
+            sim (Simulation): game being played
+            ahead (list): obstacles ahead of the block, left to right
+            front (int): world x position of the front of the block
+        """
+        # the next few clusters, as (distance from the block, boxes relative to the cluster)
+        self.clusters = []
+        right = None
+        for obstacle in ahead:
+            # the block needs its own width and a frame or two to land in between two obstacles
+            if right is None or obstacle.left - right >= BLOCK_WIDTH + 2*sim.speed:
+                if len(self.clusters) == LOOKAHEAD:
+                    break
+                self.clusters.append((obstacle.left - front, []))
+                start = obstacle.left
+            low = GROUND_Y - obstacle.bottom
+            for dx, bottom, width, height in obstacle.parts:
+                left = obstacle.x + dx - start
+                self.clusters[-1][1].append((left, left + width, low, GROUND_Y - bottom + height))
+            right = obstacle.right
+        self.cluster = ahead[0]
+
+        # step the clock and the score the way Simulation.step() does, until
+        # every cluster has gone by, however long the block is in the air
+        frames = (right - front + BLOCK_WIDTH) // max(sim.speed, 1) + max(self.table.lengths) + 2
+        now, score, score_timer = sim.time, sim.score, sim.score_timer
+        speeds = []
+        # (first frame, frame past the end, speed) of every stretch of frames at one speed
+        self.stretches = []
+        for frame in range(frames):
+            now += FRAME_TIME
+            speed = sim.obs_velocity + score // sim.obs_vel_chng_rt
+            speeds.append(speed)
+            if not self.stretches or self.stretches[-1][2] != speed:
+                self.stretches.append([frame, frames, speed])
+                if len(self.stretches) > 1:
+                    self.stretches[-2][1] = frame
+            if now - score_timer > 100:
+                score += 1
+                score_timer = now
+        self.scrolls = list(itertools.accumulate(speeds, initial=0))
+        self.settled = sim.block_y == GROUND_Y
+        self.found = {}
+        self.merges = {}
+        memo = {}
+        best = self.search(0, 0, memo)
+        if best is None:
+            # nothing gets past everything ahead, at least get past the first cluster
+            best = min(self.ways(0, 1, 0), default=None)
+        if best is None or not best[2]:
+            # staying on the ground, or no jump gets past and it is too late anyway
+            self.takeoff, self.jump = None, 0
+        else:
+            self.takeoff, self.jump = sim.frame + best[1], best[2]
+
+    def search(self, n, start, memo):
+        """Find the way past cluster n that frees the block soonest and still
+        leaves a way past every cluster after it.
+
+        Args:
+            n (int): index of the cluster in clusters
+            start (int): first frame (counting from now) the block can jump
+            memo (dict): results so far, keyed by (n, start)
+
+        Returns:
+            tuple: (free, frame, hold) as in ways(), None if there is no way past
+        """
+        if (n, start) not in memo:
+            memo[n, start] = None
+            # land in between clusters if possible, otherwise jump over more at once
+            for span in range(1, len(self.clusters) - n + 1):
+                for way in sorted(self.ways(n, span, start)):
+                    if way[2] and not self.clears(n, span, way[1], way[2]):
+                        continue
+                    if n + span == len(self.clusters) or self.search(n + span, way[0], memo) is not None:
+                        memo[n, start] = way
+                        break
+                if memo[n, start] is not None:
+                    break
+        return memo[n, start]
+
+    def merged(self, n, span):
+        """Return the boxes of span clusters from cluster n on, relative to cluster n.
+
+        Returns:
+            tuple: (boxes, left of the leftmost box, right of the rightmost box,
+                   right of the rightmost box on the ground, top of the highest box)
+        """
+        if (n, span) not in self.merges:
+            distance, boxes = self.clusters[n]
+            for other, more in self.clusters[n + 1:n + span]:
+                gap = other - distance
+                boxes = boxes + [(left + gap, right + gap, low, high) for left, right, low, high in more]
+            self.merges[n, span] = (boxes, min(box[0] for box in boxes), max(box[1] for box in boxes),
+                                    max([box[1] for box in boxes if box[2] < BLOCK_HEIGHT], default=-FAR),
+                                    max(box[3] for box in boxes))
+        return self.merges[n, span]
+
+    def ways(self, n, span, start):
+        """Find every way past span clusters from cluster n on, taken as one.
+
+        The ways are looked up in the JumpTable at the speed of the frame the
+        block would take off on; jumps that are still in the air when the
+        world speeds up are checked frame by frame with clears() instead.
+
+        Args:
+            n (int): index of the first cluster in clusters
+            span (int): number of clusters
+            start (int): first frame (counting from now) the block can jump
+
+        Returns:
+            list: (free, frame, hold) for every way that can still be taken:
+                  the block takes off on frame frame with the jump key held
+                  for hold frames (0 for staying on the ground), and is free to
+                  jump again on frame free
+        """
+        distance = self.clusters[n][0]
+        scrolls = self.scrolls
+        found = []
+        for index, (first, end, speed) in enumerate(self.stretches):
+            if end <= start:
+                continue
+            begin = max(start, first)
+            # jumps taking off near the end of the stretch are still in the air when the
+            # world speeds up, which moves their windows by a few frames: note where the
+            # windows at either speed put them and look for the earliest one frame by frame
+            spanning = {}
+            if index + 1 < len(self.stretches):
+                for lo, hi, free, hold in self.options(n, span, speed) + self.options(n, span, self.stretches[index + 1][2]):
+                    if hold:
+                        spanning.setdefault(hold, []).append(bisect.bisect_left(scrolls, distance - hi, begin))
+            for hold, frames in spanning.items():
+                length = len(self.table.arcs[hold - 1])
+                around = 1 + length // speed
+                for frame in range(max(begin, end - length + 1, min(frames) - around), min(end, max(frames) + around)):
+                    if self.clears(n, span, frame, hold):
+                        found.append((frame + length, frame, hold))
+                        break
+            for lo, hi, free, hold in self.options(n, span, speed):
+                # the first frame the cluster is no more than hi away
+                frame = bisect.bisect_left(scrolls, distance - hi, begin)
+                if frame >= end or distance - scrolls[frame] < lo:
+                    # windows the cluster has already gone past are no use any more
+                    continue
+                if hold:
+                    free = frame + len(self.table.arcs[hold - 1])
+                    if free > end:
+                        # taken care of above
+                        continue
+                else:
+                    free = bisect.bisect_left(scrolls, distance - free, start)
+                found.append((free, frame, hold))
+        return found
+
+    def options(self, n, span, speed):
+        '''Return the ways past span clusters from cluster n on at a speed, see JumpTable.options()'''
+        if (n, span, speed) not in self.found:
+            self.found[n, span, speed] = self.table.options(self.merged(n, span)[0], speed)
+        return self.found[n, span, speed]
+
+    def clears(self, n, span, frame, hold):
+        """Check a jump against every frame it is in the air, with the world scrolling as it will.
+
+        Args:
+            n (int): index of the first cluster in clusters
+            span (int): number of clusters jumped over at once
+            frame (int): frame (counting from now) the block takes off on
+            hold (int): frames the jump key is held for
+
+        Returns:
+            bool: True if the block touches none of the obstacles (including those of
+                  the clusters after them) up to and including landing, and is past the
+                  ones on the ground it jumps over by then
+        """
+        distance = self.clusters[n][0]
+        arc = self.table.arcs[hold - 1]
+        landing = frame + len(arc)
+        scrolls = self.scrolls
+        if landing >= len(scrolls):
+            return False
+        # landing in front of an obstacle on the ground does not get past it
+        if distance - scrolls[landing] + self.merged(n, span)[3] > -BLOCK_WIDTH:
+            return False
+        # the clusters after them may reach the block before it lands
+        boxes, first, last, _, top = self.merged(n, len(self.clusters) - n)
+        # on_ground() is already True up to half a pixel above the ground, so a jump
+        # before the block has settled back on the ground can be a pixel off either way
+        slack = 0 if frame or self.settled else 1
+        # only the frames some of the cluster is level with the block
+        for now in range(max(frame, bisect.bisect_right(scrolls, distance + first)),
+                         min(landing, bisect.bisect_left(scrolls, distance + last + BLOCK_WIDTH))):
+            height = arc[now - frame]
+            if height >= top + slack:
+                # over everything
+                continue
+            x = distance - scrolls[now]
+            for left, right, low, high in boxes:
+                if x + left < 0 and x + right > -BLOCK_WIDTH and height < high + slack and height + BLOCK_HEIGHT > low - slack:
+                    return False
+        return True
+
+
+def collisions(table, boxes, speed):
+    """Step every way past a group of obstacles that table.options() finds, frame by frame.
+
+    Args:
+        table (JumpTable): jumps to check
+        boxes (list): (left, right, low, high) of the obstacles, see JumpTable.options()
+        speed (int): distance the world scrolls each frame
+
+    Returns:
+        list: (distance, hold) of every takeoff that touches an obstacle, or lands in front of one
+    """
+    found = []
+    for lo, hi, _, hold in table.options(boxes, speed):
+        arc = table.arcs[hold - 1] if hold else [0]
+        # staying on the ground lasts until the group has gone by
+        frames = len(arc) if hold else (lo + max(box[1] for box in boxes) + BLOCK_WIDTH) // speed + 1
+        # mistakes show at either end of a window
+        ends = set(range(lo, int(min(hi, lo + 2*speed)) + 1))
+        if hi < FAR:
+            ends.update(range(max(lo, hi - 2*speed), hi + 1))
+        for distance in sorted(ends):
+            for frame in range(frames + 1):
+                height = arc[frame] if frame < len(arc) else 0
+                x = distance - frame*speed
+                if any(x + left < 0 and x + right > -BLOCK_WIDTH and height < high and height + BLOCK_HEIGHT > low
+                       for left, right, low, high in boxes):
+                    found.append((distance, hold))
+                    break
+            else:
+                if hold and any(x + right > -BLOCK_WIDTH for left, right, low, high in boxes if low < BLOCK_HEIGHT):
+                    found.append((distance, hold))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the jump table against groups of obstacles frame by frame.')
+    parser.parse_args(argv)
+
+    table = jump_table(GRAVITY, ANTIGRAVITY, PLAYER_JUMP)
+    cactus = [(0, OBS_WIDTH, 0, 65)]
+    failed = 0
+    for speed in (OBS_VELOCITY, OBS_VELOCITY + 3, OBS_VELOCITY + 6):
+        # a cactus with a bird right behind it, high enough to run under: the
+        # block has to jump the cactus without flying into the bird
+        for gap in range(OBS_WIDTH, 4*BLOCK_WIDTH, 10):
+            boxes = cactus + [(gap, gap + BIRD_WIDTH, 60, 60 + BIRD_HEIGHT)]
+            bad = collisions(table, boxes, speed)
+            if bad or any(hold == 0 for _, _, _, hold in table.options(boxes, speed)):
+                failed += 1
+                print('speed %d, bird %d behind the cactus: %s' % (
+                    speed, gap, 'takes off %d away holding %d frames' % bad[0] if bad else 'stays on the ground'))
+    print('OK' if not failed else '%d groups FAILED' % failed)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+# High score table. Scores are kept in memory, loaded once, and written to
+# disk on a background thread so the game never waits on the file system.
+#
+# On disk the table is a snapshot file plus an append-only log of the scores
+# added since the snapshot. Every entry in the log has a sequence number and
+# the snapshot remembers the last one it includes, so a crash at any point
+# loses at most the entry being written. Every so often the log is folded into
+# a new snapshot, which replaces the old one atomically.
+#
+# The same writer thread saves the replay of every game that ends, so the end
+# screen never waits on the disk either.
+import json
+import os
+import queue
+import stat
+import tempfile
+import threading
+from setting import *
+
+# permissions new files get, read once here because os.umask() can only be
+# read by changing it, which is not safe once other threads are running
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def atomic_write(path, text):
+    '''Replace a file with new contents (str, or bytes for a binary file) so readers only ever see the old or the new file'''
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(text, bytes) else 'w') as outfile:
+            outfile.write(text)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+        # mkstemp() makes the file readable by its owner only, keep the permissions
+        # of the file it replaces (or those of any new file) instead
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    # the rename itself is only on disk once the directory is
+    if os.name != 'nt':
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def insert_score(table, score, size):
+    """Insert a score into a table sorted from best to worst.
+
+    Args:
+        table (list): scores, best first
+        score (int): score to insert
+        size (int): number of scores the table keeps
+
+    Returns:
+        bool: True if the score made it into the table
+    """
+    if len(table) >= size and score <= table[-1]:
+        return False
+    n = 0
+    while n < len(table) and table[n] >= score:
+        n += 1
+    table.insert(n, score)
+    del table[size:]
+    return True
+
+
+class Leaderboard(object):
+    """Leaderboard keeps the best scores of every player.
+
+    Args:
+        path (str): snapshot file
+        log_path (str): append-only log of the scores added since the snapshot
+        size (int): number of scores kept per player
+        compact_every (int): number of logged scores after which a new snapshot is written
+        legacy_path (str): old single-score highscores file imported when there is no snapshot
+
+    Attributes:
+        tables (dict): player name to list of scores, best first
+        seq (int): sequence number of the last score added
+        queue (Queue): scores and files (see write_file()) waiting to be written by the writer thread
+    """
+    def __init__(self, path=LEADERBOARD_FILE, log_path=LEADERBOARD_LOG, size=LEADERBOARD_SIZE,
+                 compact_every=20, legacy_path='highscores.txt'):
+        self.path = path
+        self.log_path = log_path
+        self.size = size
+        self.compact_every = compact_every
+        self.tables = {}
+        self.seq = 0
+        # True if the log ends in a line cut short by a crash
+        self.torn = False
+        self.load(legacy_path)
+        # the writer thread keeps its own copy of what is on disk
+        self.saved = {player: list(table) for player, table in self.tables.items()}
+        self.saved_seq = self.seq
+        self.logged = 0
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.writer, name='leaderboard', daemon=True)
+        self.thread.start()
+
+    def load(self, legacy_path):
+        '''Read the snapshot and the log written after it'''
+        snapshot_seq = 0
+        if os.path.exists(self.path):
+            with open(self.path) as infile:
+                snapshot = json.load(infile)
+            snapshot_seq = self.seq = snapshot['seq']
+            self.tables = {player: list(table) for player, table in snapshot['players'].items()}
+        elif legacy_path and os.path.exists(legacy_path):
+            with open(legacy_path) as infile:
+                text = infile.read().strip()
+            if text.isdigit() and int(text):
+                self.tables[PLAYER_NAME] = [int(text)]
+
+        if os.path.exists(self.log_path):
+            with open(self.log_path) as infile:
+                lines = infile.read()
+            self.torn = bool(lines) and not lines.endswith('\n')
+            for line in lines.splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a line cut short by a crash while it was written
+                    continue
+                if entry['seq'] > snapshot_seq:
+                    insert_score(self.tables.setdefault(entry['player'], []), entry['score'], self.size)
+                    self.seq = max(self.seq, entry['seq'])
+
+    def best(self, player=PLAYER_NAME):
+        '''Return the best score of a player, 0 if they have none'''
+        table = self.tables.get(player)
+        return table[0] if table else 0
+
+    def top(self, player=PLAYER_NAME):
+        '''Return the scores of a player, best first'''
+        return list(self.tables.get(player, ()))
+
+    def submit(self, score, player=PLAYER_NAME):
+        """Add a score to the table. Returns right away, the score is saved in the background.
+
+        Args:
+            score (int): score reached
+            player (str): name of the player
+
+        Returns:
+            bool: True if the score made it into the player's table
+        """
+        if score <= 0 or not insert_score(self.tables.setdefault(player, []), score, self.size):
+            return False
+        self.seq += 1
+        self.queue.put({'seq': self.seq, 'player': player, 'score': score})
+        return True
+
+    def write_file(self, path, contents):
+        """Replace a file with atomic_write(). Returns right away, the file is written in the background.
+
+        Args:
+            path (str): file to replace
+            contents (bytes): new contents of the file
+        """
+        self.queue.put((path, contents))
+
+    def writer(self):
+        '''Background thread: append queued scores to the log, compact it now and then and write queued files'''
+        while True:
+            entry = self.queue.get()
+            if entry is None:
+                if self.logged:
+                    self.compact()
+                return
+            if isinstance(entry, tuple):
+                path, contents = entry
+                try:
+                    atomic_write(path, contents)
+                except OSError as error:
+                    # a file that cannot be written is no reason to stop saving scores
+                    print('could not write %s: %s' % (path, error))
+                continue
+            with open(self.log_path, 'a') as outfile:
+                if self.torn:
+                    # finish off the cut short line so the new entry starts on its own line
+                    outfile.write('\n')
+                    self.torn = False
+                outfile.write(json.dumps(entry) + '\n')
+                outfile.flush()
+                os.fsync(outfile.fileno())
+            insert_score(self.saved.setdefault(entry['player'], []), entry['score'], self.size)
+            self.saved_seq = entry['seq']
+            self.logged += 1
+            if self.logged >= self.compact_every:
+                self.compact()
+
+    def compact(self):
+        '''Write a new snapshot holding everything in the log, then start a new log'''
+        atomic_write(self.path, json.dumps({'seq': self.saved_seq, 'players': self.saved}))
+        # entries up to saved_seq are skipped on load from now on, so losing
+        # the old log here (or not) does not matter
+        atomic_write(self.log_path, '')
+        self.logged = 0
+
+    def close(self):
+        '''Write everything still queued and stop the writer thread'''
+        self.queue.put(None)
+        self.thread.join()
@@ -0,0 +1,413 @@
+# Level generator. Decides the layout of every group of obstacles ahead of
+# time: where the group appears, whether it is cacti or a bird, and the
+# height, arm and bump layout of every cactus. Specs come from a lazy, seeded
+# stream, either as they are needed or in chunks on a worker thread, so
+# spawning an obstacle during a frame only takes a ready spec off a queue.
+#
+# Every group is checked against the jump arcs of the block (see jumparc.py):
+# a group is only handed out if it can be cleared on its own and right after
+# the group before it. Groups that fail are drawn again, up to MAX_ATTEMPTS
+# times; after that the last one drawn is handed out anyway, marked as not
+# cleared. Only pairs of groups are checked, so three groups close together
+# can still leave no way through. When groups spawn
+# and how fast the world scrolls depends on neither the player nor the seed,
+# so both are worked out ahead of time from the clock and the score alone.
+import bisect
+from collections import deque
+from functools import lru_cache
+import itertools
+from operator import itemgetter
+import threading
+import time
+from setting import *
+# imported as a module, simulation.py imports this one as well
+import simulation
+import jumparc
+
+# groups drawn again at most this many times when they cannot be cleared
+MAX_ATTEMPTS = 20
+# heights a cactus body can have
+CACTUS_HEIGHTS = range(50, 80)
+
+
+class GroupSpec(object):
+    """Layout of one group of obstacles.
+
+    Args:
+        kind (str): 'cactus' or 'bird'
+        offset (int): screen x position the group appears at
+        cacti (tuple): (height, l_arm, r_arm, l_bump, r_bump) of every cactus, left to right
+        altitude (int): height of the bottom of a bird above the ground
+        cleared (bool): False if the group cannot be cleared
+
+    Attributes:
+        kind (str): 'cactus' or 'bird'
+        offset (int): screen x position the group appears at
+        cacti (tuple): layout of every cactus, empty for a bird
+        altitude (int): height of the bottom of a bird above the ground, 0 for cacti
+        cleared (bool): False if the group was handed out after MAX_ATTEMPTS draws
+                        that could not be cleared, see group_specs()
+    """
+    __slots__ = ('kind', 'offset', 'cacti', 'altitude', 'cleared')
+
+    def __init__(self, kind, offset, cacti=(), altitude=0, cleared=True):
+        self.kind = kind
+        self.offset = offset
+        self.cacti = cacti
+        self.altitude = altitude
+        self.cleared = cleared
+
+    def __repr__(self):
+        return 'GroupSpec(%r, %r, %r, %r, %r)' % (self.kind, self.offset, self.cacti, self.altitude, self.cleared)
+
+    def boxes(self, spacing):
+        """Return the box of every piece of every obstacle in the group.
+
+        Args:
+            spacing (int): distance between the cacti of a group
+
+        Returns:
+            list: (left, right, low, high) of every piece, x relative to the
+                  group's x position and heights measured up from the ground
+        """
+        if self.kind == 'bird':
+            return [(0, BIRD_WIDTH, self.altitude, self.altitude + BIRD_HEIGHT)]
+        boxes = []
+        for n, layout in enumerate(self.cacti):
+            for dx, bottom, width, height in simulation.CactusState(spacing*n, *layout).parts:
+                # a piece up in the air still blocks the block from running under it
+                boxes.append((spacing*n + dx, spacing*n + dx + width, 0, GROUND_Y - bottom + height))
+        return boxes
+
+
+class Schedule(object):
+    """Schedule works out where groups of obstacles spawn and how fast the world scrolls.
+
+    Neither depends on the player or the seed: the score only counts time,
+    and the time in between groups and the speed only change with the score.
+    So the schedule steps just those counters, the same way Simulation.step()
+    does, without a block or any obstacles. Every game played with the same
+    settings shares one Schedule (see schedule()), which only ever gets
+    longer.
+
+    Args:
+        obs_velocity (int): OBS_VELOCITY setting
+        obs_vel_chng_rt (int): OBS_VEL_CHNG_RT setting
+
+    Attributes:
+        scroll (int): distance the world has scrolled so far
+        spawns (list): scroll at each spawn so far
+        speeds (list): (scroll, speed) every time the speed changed
+    """
+    def __init__(self, obs_velocity, obs_vel_chng_rt):
+        self.obs_velocity = obs_velocity
+        self.obs_vel_chng_rt = obs_vel_chng_rt
+        self.time = 0.0
+        self.score = 0
+        self.score_timer = 0
+        self.timer = 0
+        self.obs_gen_time = OBS_GEN_TIME
+        self.scroll = 0
+        self.spawns = []
+        self.speeds = [(0, obs_velocity)]
+        # games on other threads (the prefetching worker, batch.py) may share the schedule
+        self.lock = threading.Lock()
+
+    def advance(self, scroll=None, spawns=None):
+        """Step the counters the way Simulation.step() changes them, frame by frame.
+
+        Args:
+            scroll (int): stop once the world has scrolled this far
+            spawns (int): stop once there have been this many spawns
+        """
+        # kept in locals while stepping
+        velocity = self.obs_velocity
+        rate = self.obs_vel_chng_rt
+        now = self.time
+        score = self.score
+        score_timer = self.score_timer
+        timer = self.timer
+        obs_gen_time = self.obs_gen_time
+        total = self.scroll
+        speed = self.speeds[-1][1]
+        shrinking = score % 200 == 0
+        found = self.spawns
+        while (total < scroll) if scroll is not None else len(found) < spawns:
+            now += FRAME_TIME
+            # Simulation.move()
+            total += speed
+            # Simulation.spawn()
+            if shrinking and obs_gen_time > OBS_GEN_TIME_MIN:
+                obs_gen_time -= 50
+            if now - timer > obs_gen_time:
+                found.append(total)
+                timer = now
+            # Simulation.tally()
+            if now - score_timer > 100:
+                score += 1
+                score_timer = now
+                # the rest only changes with the score, from the next frame on
+                shrinking = score % 200 == 0
+                if velocity + score // rate != speed:
+                    speed = velocity + score // rate
+                    self.speeds.append((total + speed, speed))
+        self.time = now
+        self.score = score
+        self.score_timer = score_timer
+        self.timer = timer
+        self.obs_gen_time = obs_gen_time
+        self.scroll = total
+
+    def spawn(self, group):
+        '''Return the scroll at which group number group (counting from 0) spawns'''
+        if group >= len(self.spawns):
+            with self.lock:
+                self.advance(spawns=group + 1)
+        return self.spawns[group]
+
+    def speed_at(self, scroll):
+        '''Return the speed of the world once it has scrolled this far'''
+        if self.scroll < scroll:
+            with self.lock:
+                self.advance(scroll=scroll)
+        return self.speeds[bisect.bisect_right(self.speeds, (scroll, jumparc.FAR)) - 1][1]
+
+
+@lru_cache(maxsize=16)
+def schedule(obs_velocity, obs_vel_chng_rt):
+    '''Return the Schedule of a set of speed settings, shared by every game played with them'''
+    return Schedule(obs_velocity, obs_vel_chng_rt)
+
+
+class Clearance(object):
+    """Clearance checks groups of obstacles against the jump arcs of the block.
+
+    Args:
+        rules (dict): settings the game is played with, as in simulation.RULES
+
+    Attributes:
+        table (JumpTable): every jump the block can make with these settings
+        checked (GroupSpec): group checked last
+        boxes (list): boxes of the group checked last, see GroupSpec.boxes()
+        found (dict): ways past the group checked last, keyed by speed
+    """
+    def __init__(self, rules):
+        self.rules = rules
+        self.table = jumparc.jump_table(rules['GRAVITY'], rules['ANTIGRAVITY'], rules['PLAYER_JUMP'])
+        self.checked = None
+        self.boxes = None
+        self.found = {}
+
+    def clearable(self, spec, speeds, previous=None, gap=0):
+        """Check that a group can be cleared, also right after the group before it.
+
+        Args:
+            spec (GroupSpec): group to check
+            speeds (iterable): speeds the world may scroll at while the block gets past
+            previous (GroupSpec): group spawned just before it, if any
+            gap (int): distance from the x position of previous to that of spec
+
+        Returns:
+            bool: True if the block can get past the group at every speed
+        """
+        spacing = self.rules['OBS_SPACING']
+        boxes = spec.boxes(spacing)
+        # the group before this one was usually the last one checked, at some of the same speeds
+        if previous is None:
+            before, known = None, {}
+        elif previous is self.checked:
+            before, known = self.boxes, self.found
+        else:
+            before, known = previous.boxes(spacing), {}
+        self.checked = spec
+        self.boxes = boxes
+        self.found = {}
+        for speed in speeds:
+            options = self.found[speed] = self.table.options(boxes, speed)
+            if not options:
+                return False
+            if before is None:
+                continue
+            first = known.get(speed)
+            if first is None:
+                first = known[speed] = self.table.options(before, speed)
+            if not self.follows(first, options, gap, speed):
+                # maybe both groups can be cleared in a single jump (or, with a
+                # bird the block fits under, by jumping one and running under the other)
+                together = before + [(left + gap, right + gap, low, high) for left, right, low, high in boxes]
+                if not self.table.options(together, speed):
+                    return False
+        return True
+
+    def follows(self, first, second, gap, speed):
+        '''Return True if the block can clear a group with one of first, then the next one with one of second'''
+        if not first:
+            return False
+        # taking off as early as possible for the first group frees the block up soonest
+        distance = max(map(itemgetter(2), first)) + gap
+        for lo, hi, _, _ in second:
+            # the block can take off again on any later frame
+            if hi >= distance:
+                wait = 0
+            else:
+                wait = -((hi - distance) // speed)
+            if distance - wait*speed >= lo:
+                return True
+        return False
+
+
+def group_specs(seed, rules=None):
+    """Lazy, endless stream of the obstacle groups of a game.
+
+    Args:
+        seed (int): seed of the game
+        rules (dict): settings the game is played with, defaults to simulation.RULES
+
+    Yields:
+        GroupSpec: the next group of obstacles, not cleared if none of
+                   MAX_ATTEMPTS draws could be cleared
+    """
+    rules = dict(simulation.RULES, **(rules or {}))
+    timeline = schedule(rules['OBS_VELOCITY'], rules['OBS_VEL_CHNG_RT'])
+    clearance = Clearance(rules)
+    spawn_rng = simulation.make_rng(seed, 'spawn')
+    cactus_rng = simulation.make_rng(seed, 'cactus')
+    bird_rng = simulation.make_rng(seed, 'birds')
+    # screen x position of the front of the block
+    front = BLOCK_X - BLOCK_WIDTH//2 + BLOCK_WIDTH
+    previous = None
+    for group in itertools.count():
+        scroll = timeline.spawn(group)
+        for attempt in range(MAX_ATTEMPTS):
+            # Obstacle x position called before inner loop because spacing
+            # and positioning around number of obstacles must remain the same
+            offset = spawn_rng.randint(WIDTH, WIDTH + 100)
+            if group >= BIRD_FIRST_GROUP and bird_rng.random() < BIRD_CHANCE:
+                spec = GroupSpec('bird', offset, altitude=bird_rng.choice(BIRD_ALTITUDES))
+            else:
+                # Generate obstacles in groups 1-3
+                count = spawn_rng.randint(1, 4) - 1
+                spec = GroupSpec('cactus', offset, tuple(cactus_layout(cactus_rng) for _ in range(count)))
+            # speed of the world when the group reaches the block
+            speed = timeline.speed_at(scroll + offset - front)
+            if previous is None:
+                fits = clearance.clearable(spec, (speed,))
+            else:
+                fits = clearance.clearable(spec, {previous_speed, speed}, previous,
+                                           scroll + offset - previous_x)
+            if fits:
+                break
+        else:
+            # give up on this group, the game counts it (see Simulation.uncleared)
+            spec.cleared = False
+        # a group of no cacti leaves nothing to jump over next time, and the
+        # next group is no easier to clear after one that cannot be cleared
+        if not spec.cleared:
+            previous = None
+        elif spec.kind == 'bird' or spec.cacti:
+            previous = spec
+            previous_x = scroll + offset
+            previous_speed = speed
+        yield spec
+
+
+def cactus_layout(rng):
+    """Pick the height, arm and bump positions of one cactus.
+
+    Args:
+        rng (Random): random number generator of the cactus shapes
+
+    Returns:
+        tuple: (height, l_arm, r_arm, l_bump, r_bump)
+    """
+    height = rng.randrange(CACTUS_HEIGHTS.start, CACTUS_HEIGHTS.stop)
+    # The arm positions of the block cactuses have two settings 1/2 height or 2/3 height.
+    # This position is randomly chosen.
+    arm_y_pos = [OBS_Y_POS - round(height * 2/3), OBS_Y_POS - round(height * 1/2)]
+    l_choose = rng.choice(arm_y_pos)
+    r_choose = rng.choice(arm_y_pos)
+    # Arm bump positions have two possible positions; on top of the arm or on bottom
+    # This bump position is dependent on the overall arm position just chosen
+    # and is then randomly choosen between top and bottom
+    l_bump_choose = rng.choice([l_choose - ARM_HEIGHT, l_choose + 5])
+    r_bump_choose = rng.choice([r_choose - ARM_HEIGHT, r_choose + 5])
+    return (height, l_choose, r_choose, l_bump_choose, r_bump_choose)
+
+
+def cactus_layouts():
+    """Every layout cactus_layout() can pick.
+
+    Yields:
+        tuple: (height, l_arm, r_arm, l_bump, r_bump)
+    """
+    for height in CACTUS_HEIGHTS:
+        arm_y_pos = [OBS_Y_POS - round(height * 2/3), OBS_Y_POS - round(height * 1/2)]
+        for l_choose, r_choose in itertools.product(arm_y_pos, repeat=2):
+            for l_bump_choose in (l_choose - ARM_HEIGHT, l_choose + 5):
+                for r_bump_choose in (r_choose - ARM_HEIGHT, r_choose + 5):
+                    yield (height, l_choose, r_choose, l_bump_choose, r_bump_choose)
+
+
+class LevelGenerator(object):
+    """LevelGenerator keeps the next few groups of obstacles of a game ready.
+
+    Without prefetching each spec is made when it is asked for, so a short
+    game never pays for groups it does not reach; with prefetching a worker
+    thread keeps a chunk of specs ready while the game plays. Both hand out
+    exactly the same specs.
+
+    Args:
+        seed (int): seed of the game
+        rules (dict): settings the game is played with
+        chunk (int): number of specs the worker thread keeps ready
+        prefetch (bool): generate specs on a worker thread
+
+    Attributes:
+        ready (deque): generated specs waiting to be spawned
+    """
+    def __init__(self, seed, rules=None, chunk=8, prefetch=False):
+        self.stream = group_specs(seed, rules)
+        self.chunk = chunk
+        self.ready = deque()
+        self.closed = False
+        self.thread = None
+        if prefetch:
+            self.condition = threading.Condition()
+            self.thread = threading.Thread(target=self.prefetch, name='levelgen', daemon=True)
+            self.thread.start()
+
+    def next(self):
+        '''Return the next group of obstacles'''
+        if self.thread is None:
+            return next(self.stream)
+        with self.condition:
+            # only waits if the worker has fallen behind
+            while not self.ready:
+                self.condition.wait()
+            spec = self.ready.popleft()
+            if len(self.ready) < self.chunk:
+                self.condition.notify_all()
+            return spec
+
+    def prefetch(self):
+        '''Worker thread: keep at least one chunk of specs ready'''
+        while True:
+            with self.condition:
+                while len(self.ready) >= self.chunk and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+            for spec in itertools.islice(self.stream, self.chunk - len(self.ready)):
+                with self.condition:
+                    self.ready.append(spec)
+                    self.condition.notify_all()
+                # hand the GIL back after every spec, otherwise a frame can
+                # wait for the whole chunk (up to the 5 ms switch interval)
+                time.sleep(0)
+
+    def close(self):
+        '''Stop the worker thread'''
+        if self.thread is not None:
+            with self.condition:
+                self.closed = True
+                self.condition.notify_all()
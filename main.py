@@ -1,165 +1,236 @@
 # Block Run Game
 
+import time
+# taken before anything else is imported, so startup timings include loading pygame
+LAUNCH = time.perf_counter()
+import json
+import sys
 import pygame as pg
-import random
 import os
 from setting import *
 from sprites import *
-
-current_dir = os.path.dirname(__file__)
+from simulation import Simulation, make_rng
+from replay import InputLog
+from recorder import Recorder, clip_path
+from telemetry import TelemetryLog
+from assets import Assets, to_display
+from leaderboard import Leaderboard
+from text import TextRenderer
+from profiler import FrameProfiler
+from jumparc import Autopilot
+
+# timer event that drives the animation of the idle screens
+ATTRACT_EVENT = pg.USEREVENT + 1
+# timer event that starts a demo game on the start screen
+DEMO_EVENT = pg.USEREVENT + 2
 
 class Game(object):
     """Game object contains game loop and controls events
 
+    Args:
+        launch (float): time.perf_counter() when the program started, for the startup timings
+
     Attributes:
-        jump_sound (Sound): game sounds      
-        hit_sound (Sound): game sounds 
-        score_sound (Sound): game sounds
+        assets (Assets): started pygame modules, game sounds and startup timings
         screen (Surface): surface on which game is played
         clock (Clock): keeps track of in-game time
+        render_fps (int): frames drawn per second, the game itself runs at FPS
+        lag (float): milliseconds of real time the game has yet to catch up on
+        skipped (float): milliseconds of real time the game gave up on catching up
+        view_scroll (int): world scroll drawn this frame, in between the last two frames of the game
+        view_bottom (int): y position of the bottom of the block drawn this frame
         running (bool): keeps track if game is running
         font_name (str): font used for text writing
+        text (TextRenderer): cache of fonts and rendered text
+        leaderboard (Leaderboard): best scores, saved in the background
+        controller (callable): if set, called with the game every frame to decide
+                               whether to jump instead of reading the keyboard
+        profiler (FrameProfiler): timings of the phases of recent frames
+        show_profiler (bool): True while the performance overlay is shown (F3)
+        recorder (Recorder): clip being recorded (F5), None when not recording
+        record_games (bool): record a clip of every game
+        recordings (list): recorders of the clips that were recorded, possibly still being written
+        telemetry (TelemetryLog): per-frame telemetry being recorded, None when it is off
+        demo (bool): True while the autopilot plays a demo game on the start screen
     """    
-    def __init__(self):
+    def __init__(self, launch=None):
         # initialize game window, sprite, etc.
-        pg.init()
-        pg.mixer.init()
-        self.jump_sound = pg.mixer.Sound(os.path.join(current_dir, 'Sounds', 'block_jump.wav'))
-        self.hit_sound = pg.mixer.Sound(os.path.join(current_dir, 'Sounds', 'hit.wav'))
-        self.score_sound = pg.mixer.Sound(os.path.join(current_dir, 'Sounds', 'Pickup_Coin.wav'))
-        self.screen = pg.display.set_mode((WIDTH, HEIGHT))
-        pg.display.set_caption(TITLE)
+        # sounds are loaded later, once the start screen is up
+        self.assets = Assets(launch)
+        self.assets.mark('imports')
+        self.screen = self.assets.open_window((WIDTH, HEIGHT), TITLE)
         self.clock = pg.time.Clock()
+        # fast displays get more frames drawn, the game runs at the same speed
+        self.render_fps = RENDER_FPS or self.assets.refresh_rate()
+        self.lag = 0.0
+        self.skipped = 0.0
         self.running = True
         self.font_name = pg.font.match_font(FONT_NAME)
+        self.text = TextRenderer()
+        self.leaderboard = Leaderboard()
+        self.start_screen = None
+        self.sim = None
+        self.controller = None
+        self.profiler = FrameProfiler(fps=self.render_fps)
+        self.show_profiler = False
+        self.overlay_rect = pg.Rect(0, 0, 0, 0)
+        self.recorder = None
+        self.record_games = False
+        self.recordings = []
+        self.telemetry = TelemetryLog() if TELEMETRY else None
+        self.demo = False
+        # cactus sprites are recycled from game to game
+        self.cactus_pool = CactusPool(self)
+        self.cacti = {}
+        self.assets.mark('game')
 
     def load_data(self):
-        """Read in highscores.txt and generate highscore"""        
-        if os.path.exists('highscores.txt'):        # if highscores exist then read into file_contents
-            self.file = open('highscores.txt', 'r')
-            self.high_score_text = self.file.read()
-            self.file.close()
-        else:
-            self.high_score_text = '00000'
-        # number value of high_score for comparisons later
-        if self.high_score_text == '00000':  
-            self.high_score = 0
-        else:
-            self.high_score = int(self.high_score_text.lstrip('0'))
+        """Look up the highscore in the leaderboard (read from disk once, at startup)"""        
+        self.high_score = self.leaderboard.best()
+        self.high_score_text = self.leading_zeros[len(str(self.high_score)) - 1:] + str(self.high_score)
 
     def new_game(self):
         '''Start a new game'''
-        self.count = 0
-        self.score = 0
-        self.timer = 0
-        # score is based on game survival time
-        self.score_timer = 0
+        self.assets.load_sounds()
+        self.reset()
+        if self.record_games:
+            self.start_recording()
+        self.run()
+
+    def reset(self, seed=None):
+        """Set up a new game without starting the game loop
+
+        Args:
+            seed (int): seed of the game, picked at random if None
+        """
+        # the rules of the game (score, timers, obstacles, physics) live in the simulation
+        if self.sim is not None:
+            self.sim.close()
+        # obstacles are laid out on a worker thread so spawning them never holds up a frame
+        self.sim = Simulation(seed, prefetch=True)
+        self.jump_held = False
+        # sprites are drawn in between where the game was last frame and where it is now
+        self.prev_scroll = self.view_scroll = self.sim.scroll
+        self.prev_bottom = self.view_bottom = self.sim.block_bottom
+        self.lag = 0.0
+        # every frame's input is recorded so the game can be replayed
+        self.input_log = InputLog(self.sim.seed)
         # the leading zeros that will go infront of the score
         self.leading_zeros = '0000'
-        # the obstacle generation time is moves downward as game progresses
-        self.obs_gen_time = 1500
         self.load_data()
 
-        self.all_sprites = pg.sprite.Group()
+        # RenderUpdates keeps track of the screen area each sprite covered last frame
+        self.all_sprites = pg.sprite.RenderUpdates()
         self.platforms = pg.sprite.Group()
         self.non_collidable_platforms = pg.sprite.Group()
         self.obstacles = pg.sprite.Group()
-        self.clouds = pg.sprite.Group()
-
-        # generates 4 clouds somewhere randomly on screen
-        for x in range(1, 5):
-            # x placement will be somewhere within each quadrant of WIDTH
-            x_placement = random.randint(round((x-1)/4 * WIDTH), round(x/4 * WIDTH))
-            y_placement = random.randint(50, round(1/3 * HEIGHT))
-            # clouds are composed of 14 sub clouds
-            for y in range(14):
-                # if sprite group is divisible by 7 then use random placement
-                # otherwise placement will be base on the first cloud of the group
-                if len(self.clouds) % 14 == 0:
-                    c = Cloud(x_placement, y_placement, CLOUD_WIDTH, CLOUD_HEIGHT, CLOUD_GREY, self)
-                else:
-                    # position is based on position of previously generate cloud (self.clouds[-1])
-                    # but it is shifted either up, down, left, or right by WIDTH//2
-                    x_movement = random.choice([-1, 1])
-                    # stacking zeros so that y change will only vary slightly
-                    y_movement = random.choice([-1, 0, 0, 0, 0, 0, 1])
-                    c = Cloud(self.clouds.sprites()[-1].rect.centerx + (CLOUD_WIDTH//2 * x_movement), 
-                              self.clouds.sprites()[-1].rect.centery + (CLOUD_WIDTH//2 * y_movement), 
-                              CLOUD_WIDTH, CLOUD_HEIGHT, CLOUD_GREY, self)
-                self.clouds.add(c)
-                self.all_sprites.add(c)
+
+        # the sky is made of a few prerendered cloud layers
+        cloud_rng = make_rng(self.sim.seed, 'clouds')
+        self.sky = [CloudLayer(clouds, velo, color, cloud_rng) for clouds, velo, color in CLOUD_LAYERS]
+        # give back the sprites of the cacti left over from the last game
+        for sprite in self.cacti.values():
+            self.cactus_pool.release(sprite)
+        self.cacti.clear()
         # Generate main character
         self.block = Block(self)
         self.platform_black = Platform(0, HEIGHT - 110, WIDTH, 2, BLACK)
         # Platform_white is colored same as background to keep invisible
         self.platform_white = Platform(0, HEIGHT - 100, WIDTH, 2, WHITE)
-        self.all_sprites.add(self.platform_black)
-        self.all_sprites.add(self.platform_white)
         self.all_sprites.add(self.block)
         self.platforms.add(self.platform_white)
         self.non_collidable_platforms.add(self.platform_black)
-        
-        self.run()
+
+        # platforms never move, so they are drawn once into the background
+        self.background = to_display(pg.Surface((WIDTH, HEIGHT)))
+        self.background.fill(WHITE)
+        self.platforms.draw(self.background)
+        self.non_collidable_platforms.draw(self.background)
+        # the first frame of a game redraws the whole screen
+        self.full_redraw = True
+        self.drawn_score = None
+        self.score_rect = pg.Rect(0, 0, 0, 0)
+        self.high_score_rect = pg.Rect(0, 0, 0, 0)
 
     def run(self):
         '''Run game while playing'''
         # game loop
+        # The game always moves on FRAME_TIME ms at a time. Each drawn frame runs
+        # as many frames of the game as the real time since the last one calls
+        # for (none at all on a fast display, a few when drawing falls behind)
+        # and then draws the sprites in between the last two of them.
         self.playing = True
+        last = time.perf_counter()
         while self.playing:
-            self.clock.tick(FPS)
-            self.current_time = pg.time.get_ticks()
+            self.clock.tick(self.render_fps)
+            now = time.perf_counter()
+            self.lag += (now - last) * 1000
+            last = now
+            self.profiler.begin()
             self.events()
-            self.update()
-            self.draw()
+            self.profiler.mark('events')
+            steps = 0
+            while self.lag >= FRAME_TIME and self.playing:
+                self.update()
+                self.lag -= FRAME_TIME
+                steps += 1
+                if steps == MAX_FRAME_SKIP and self.lag >= FRAME_TIME:
+                    # too far behind to catch up, let the game slow down instead
+                    self.skipped += self.lag - self.lag % FRAME_TIME
+                    self.lag %= FRAME_TIME
+            # the frame the game ended on is drawn as it is
+            self.draw(self.lag / FRAME_TIME if self.playing else 1.0)
+            if self.recorder is not None and not self.recorder.capture(self.screen, self.sim.frame):
+                # the clip is as long as it can be
+                self.stop_recording()
+            self.profiler.mark('draw')
+            self.profiler.end()
+            # the overlay text only changes a few times a second
+            if self.show_profiler and self.profiler.count % 15 == 0:
+                counts = {'sprites': len(self.all_sprites), 'obstacles': len(self.obstacles),
+                          'cacti': len(self.sim.obstacles), 'steps': steps, 'skipped ms': self.skipped}
+                if self.recorder is not None:
+                    counts['recording dropped'] = self.recorder.dropped
+                self.profiler.update_overlay(self.clock.get_fps(), counts)
+        # a clip ends with the game
+        self.stop_recording()
+        if self.telemetry is not None:
+            # the game is over, a good time to write out the frames it recorded
+            self.telemetry.flush()
 
     def update(self):
         '''Update all events that are internal to the game (collisions, movements, etc.)'''
         # game loop - update
-        self.all_sprites.update()
-        # Search for collisions between block and platform
-        hits = pg.sprite.spritecollide(self.block, self.platforms, False)
-        if hits:
-            self.block.pos.y = hits[0].rect.top
-            self.block.vel.y = 0
-            self.block.rect.midbottom = self.block.pos
-
-        obstacle_hits = pg.sprite.spritecollide(self.block, self.obstacles, False)
-        if obstacle_hits:
+        # advance the game rules by one frame; the sprites catch up when they are drawn
+        self.prev_scroll = self.sim.scroll
+        self.prev_bottom = self.sim.block_bottom
+        self.input_log.append(self.jump_held)
+        self.sim.step(self.jump_held, self.profiler)
+        if self.telemetry is not None and not self.demo:
+            self.telemetry.record(self.sim, self.jump_held)
+        # a demo plays without sound
+        if self.sim.jumped and not self.demo:
+            self.assets.play('jump')
+
+        for cactus in self.sim.spawned:
+            self.generate_cacti(cactus)
+        for cactus in self.sim.removed:
+            # scrolled off the screen, recycle object
+            self.cactus_pool.release(self.cacti.pop(cactus))
+
+        for layer in self.sky:
+            layer.update()
+
+        if not self.sim.playing:
             # If obstacle is hit, end game
             self.playing = False
+        elif self.demo and self.sim.frame >= ATTRACT_DEMO_LENGTH * FPS:
+            # a demo never goes on for long, the start screen comes back
+            self.playing = False
 
-        for obstacle in self.obstacles:
-            # if scrolled off the screen, remove object
-            if obstacle.rect.right < 0:
-                obstacle.kill()
-
-        for cloud in self.clouds:
-            if cloud.rect.right < 0:
-                cloud.rect.left = WIDTH
-
-        # Every 200 game points reduct time inbetween cactus generations up to a limit of 800ms
-        if self.score % 200 == 0 and self.obs_gen_time > 700:
-            self.obs_gen_time -= 50
-
-        # if greater than timer generate new obstacles (cacti)
-        if self.current_time - self.timer > self.obs_gen_time: # 1 second has passed by
-            # Obstacle x position called before inner loop because spacing
-            # and positioning around number of obstacles must remain the same
-            obs_x_pos = random.randint(WIDTH, WIDTH + 100)
-            # Generate obstacles in groups 1-3 spaced apart by amt spacing.
-            for n in range(1, random.randint(1,4)):
-                obs_height = random.randrange(50, 80)
-                self.generate_cacti(obs_x_pos, obs_height, n)
-
-            # Reset of timer at end of this mess
-            self.timer = self.current_time
-
-        if self.current_time - self.score_timer > 100:
-                self.score += 1
-                self.score_timer = self.current_time
-
-        if self.score % 100 == 0:
-            self.score_sound.play()
+        if self.sim.milestone and not self.demo:
+            self.assets.play('score')
+        self.profiler.mark('sprites')
 
     def events(self):
         '''Process external user input'''
@@ -172,141 +243,325 @@ class Game(object):
                 self.playing = False
                 self.running = False
 
+            elif event.type == pg.KEYDOWN:
+                if self.demo and event.key == pg.K_SPACE:
+                    # the spacebar ends the demo and starts a real game
+                    self.playing = False
+                    self.paused = False
+                elif event.key == pg.K_F3:
+                    # show or hide the performance overlay
+                    self.show_profiler = not self.show_profiler
+                    self.full_redraw = True
+                elif event.key == pg.K_F4:
+                    self.profiler.export(PROFILE_TRACE)
+                elif event.key == pg.K_F5:
+                    # start or stop recording a clip
+                    if self.recorder is None:
+                        self.start_recording()
+                    else:
+                        self.stop_recording()
+
+        if self.controller is not None:
+            self.jump_held = self.controller(self)
+            return
+
         keys = pg.key.get_pressed()
 
-        if keys[pg.K_SPACE]:
-            self.block.jump()
-                    
-    def draw(self):
-        '''Draw all game objects to screen'''
+        # holding the spacebar jumps (and keeps the block in the air for longer)
+        self.jump_held = keys[pg.K_SPACE]
+
+
+    def place(self, alpha):
+        """Move the sprites in between the last two frames of the game.
+
+        Args:
+            alpha (float): 0 for where the game was on the frame before the last one,
+                           1 for where it is now
+        """
+        self.view_scroll = round(self.prev_scroll + (self.sim.scroll - self.prev_scroll)*alpha)
+        self.view_bottom = round(self.prev_bottom + (self.sim.block_bottom - self.prev_bottom)*alpha)
+        self.all_sprites.update()
+        for layer in self.sky:
+            layer.place(alpha)
+
+    def draw(self, alpha=1.0):
+        """Draw all game objects to screen
+
+        Args:
+            alpha (float): how far the sprites are drawn from the frame before
+                           the last one towards the last one, see place()
+        """
         # game loop - draw
-        # render
-        self.screen.fill(WHITE)
-        self.all_sprites.draw(self.screen)
-        # draw the 'eye' of the block
+        self.place(alpha)
+        if self.full_redraw or not DIRTY_RECTS:
+            # render
+            self.screen.blit(self.background, (0, 0))
+            for layer in self.sky:
+                layer.draw(self.screen)
+            self.all_sprites.draw(self.screen)
+            self.draw_eye()
+            # draw score to screen
+            self.score_rect = self.draw_score()
+            self.high_score_rect = self.draw_high_score()
+            if self.show_profiler:
+                self.overlay_rect = self.profiler.draw_overlay(self.screen, self.text, self.font_name)
+            pg.display.flip() # flip after drawing everything to screen
+            self.full_redraw = False
+            return
+
+        # only the parts of the screen that changed are redrawn and sent to the display
+        # erase sprites where they were last frame
+        self.all_sprites.clear(self.screen, self.clear_area)
+        dirty = []
+        redraw_score = self.sim.score != self.drawn_score
+        redraw_high_score = False
+        for layer in self.sky:
+            if layer.moved:
+                self.clear_area(self.screen, layer.rect)
+                dirty.append(layer.rect)
+                # the scores are drawn over the sky, clearing a cloud band wipes out any text on it
+                redraw_score = redraw_score or layer.rect.colliderect(self.score_rect)
+                redraw_high_score = redraw_high_score or layer.rect.colliderect(self.high_score_rect)
+        old_score_rect = None
+        if redraw_score:
+            old_score_rect = self.score_rect
+            self.clear_area(self.screen, old_score_rect)
+        if redraw_high_score:
+            self.clear_area(self.screen, self.high_score_rect)
+        if self.show_profiler:
+            self.clear_area(self.screen, self.overlay_rect)
+        dirty += self.all_sprites.draw(self.screen)
+        self.draw_eye()
+        if old_score_rect is not None:
+            self.score_rect = self.draw_score()
+            dirty.append(self.score_rect.union(old_score_rect))
+        if redraw_high_score:
+            self.high_score_rect = self.draw_high_score()
+            dirty.append(self.high_score_rect)
+        if self.show_profiler:
+            old_overlay_rect = self.overlay_rect
+            self.overlay_rect = self.profiler.draw_overlay(self.screen, self.text, self.font_name)
+            dirty.append(self.overlay_rect.union(old_overlay_rect))
+        pg.display.update(dirty)
+
+    def clear_area(self, surface, rect):
+        """Redraw the background and sky over part of the screen
+
+        Args:
+            surface (Surface): surface to draw on
+            rect (Rect): area to redraw
+        """
+        surface.blit(self.background, rect, rect)
+        surface.set_clip(rect)
+        for layer in self.sky:
+            layer.draw(surface)
+        surface.set_clip(None)
+
+    def draw_eye(self):
+        '''Draw the 'eye' of the block'''
         pg.draw.circle(self.screen, BLACK, (self.block.rect.centerx + 10, self.block.rect.centery - 10), 2)
-        # draw score to screen
-        self.draw_text(self.leading_zeros[len(str(self.score)) - 1:] + str(self.score), 30, BLACK, WIDTH - 80, 15)
-        self.draw_text(self.high_score_text, 30, L_GRAY, WIDTH - 160, 15)
 
-        pg.display.flip() # flip after drawing everything to screen
+    def draw_score(self):
+        """Draw the current score to screen
+
+        Returns:
+            Rect: area of the screen covered by the score
+        """
+        self.drawn_score = self.sim.score
+        score = str(self.sim.score)
+        # the score is drawn from prerendered digits instead of rendering new text every time
+        return self.text.draw_number(self.screen, self.leading_zeros[len(score) - 1:] + score,
+                                     self.font_name, 30, BLACK, WIDTH - 80, 15)
 
-    def generate_cacti(self, obs_x_pos, obs_height, n):
-        """Generate cactus obstacle off screen.
+    def draw_high_score(self):
+        """Draw the high score to screen
+
+        Returns:
+            Rect: area of the screen covered by the high score
+        """
+        return self.text.draw_number(self.screen, self.high_score_text, self.font_name, 30, L_GRAY,
+                                     WIDTH - 160, 15)
+
+    def generate_cacti(self, cactus):
+        """Generate the sprites that display a simulated cactus or bird.
 
         Args:
-            obs_x_pos (int): randomly selected x position for cactus
-            obs_height (int): random selected height for cactus
-            n (int): the nth number of cactus in a grouping. Used to determine spacing.
+            cactus (CactusState): cactus (or BirdState) generated by the simulation
         """        
-        # The arm positions of the block cactuses have two settings 1/2 height or 2/3 height.
-        # This position is randomly chosen.
-        arm_y_pos = [OBS_Y_POS - round(obs_height * 2/3), OBS_Y_POS - round(obs_height * 1/2)]
-        l_choose = random.choice(arm_y_pos)
-        r_choose = random.choice(arm_y_pos)
-        # Arm bump positions have two possible positions; on top of the arm or on bottom
-        # This bump position is dependent on the overall arm position just chosen
-        # and is then randomly choosen between top and bottom
-        l_arm_bump_pos = [l_choose - ARM_HEIGHT, l_choose + 5]
-        r_arm_bump_pos = [r_choose - ARM_HEIGHT, r_choose + 5]
-        l_bump_choose = random.choice(l_arm_bump_pos)
-        r_bump_choose = random.choice(r_arm_bump_pos)
-        # create obstacle (cactus body) along with the arms and bumps
-        obs = Obstacles(obs_x_pos + OBS_SPACING * (n - 1), 
-                        OBS_Y_POS, OBS_WIDTH, obs_height, WHITE, self)
-        left_arm = Obstacles(obs_x_pos + OBS_SPACING * (n - 1) - ARM_WIDTH, 
-                        l_choose, ARM_WIDTH, ARM_HEIGHT, WHITE, self)
-        right_arm = Obstacles(obs_x_pos + OBS_SPACING * (n - 1) + OBS_WIDTH, 
-                        r_choose, ARM_WIDTH, ARM_HEIGHT, WHITE, self)
-        left_arm_bump = Obstacles(obs_x_pos + OBS_SPACING * (n - 1) - ARM_WIDTH, 
-                        l_bump_choose, 5, 5, WHITE, self)
-        right_arm_bump = Obstacles(obs_x_pos + OBS_SPACING * (n - 1) + OBS_WIDTH + ARM_WIDTH - 5, 
-                        r_bump_choose, 5, 5, WHITE, self)
-        # Add everything to the all_sprites and obstacles sprite groups.
-        self.obstacles.add(obs)
-        self.obstacles.add(right_arm)
-        self.obstacles.add(left_arm)
-        self.obstacles.add(right_arm_bump)
-        self.obstacles.add(left_arm_bump)
-        self.all_sprites.add(obs)
-        self.all_sprites.add(right_arm)
-        self.all_sprites.add(left_arm)
-        self.all_sprites.add(right_arm_bump)
-        self.all_sprites.add(left_arm_bump)
+        # obstacle (cactus body along with the arms and bumps) comes from the pool
+        sprite = self.cactus_pool.acquire(cactus)
+        self.cacti[cactus] = sprite
+        # Add it to the all_sprites and obstacles sprite groups.
+        self.obstacles.add(sprite)
+        self.all_sprites.add(sprite)
+
+    def start_recording(self):
+        '''Start recording a clip of the game into RECORD_DIR'''
+        if self.recorder is not None:
+            return
+        if not os.path.isdir(RECORD_DIR):
+            os.makedirs(RECORD_DIR)
+        self.recorder = Recorder(clip_path())
+
+    def stop_recording(self):
+        '''Stop recording, the clip is finished in the background'''
+        if self.recorder is None:
+            return
+        self.recorder.stop()
+        self.recordings.append(self.recorder)
+        self.recorder = None
+
+    def finish_recordings(self):
+        '''Wait for every recorded clip to be written and say what was recorded'''
+        self.stop_recording()
+        for recorder in self.recordings:
+            recorder.close()
+            print('recorded ' + recorder.summary())
+        self.recordings = []
+
+    def save_replay(self):
+        '''Save the replay of the game that just ended, and keep it as the best one on a new high score'''
+        self.input_log.score = self.sim.score
+        if not os.path.isdir(REPLAY_DIR):
+            os.makedirs(REPLAY_DIR)
+        # written by the leaderboard's writer thread, like the scores
+        data = self.input_log.dump()
+        self.leaderboard.write_file(os.path.join(REPLAY_DIR, 'last.brr'), data)
+        if self.sim.score > self.high_score:
+            self.leaderboard.write_file(os.path.join(REPLAY_DIR, 'best.brr'), data)
 
     def write_highscores(self):
-        '''Determine if current score is high score and write to outfile'''
-        # if new score is greater than highscore, replace, and write to file
-        self.outfile = open('highscores.txt', 'w')  # open up file in 'w' under same name to overwrite scores in new order
-
-        if self.score > self.high_score:
-            self.high_score = self.score
-            self.outfile.write(self.leading_zeros[len(str(self.score)) - 1:] + str(self.high_score))
-        else:
-            self.outfile.write(str(self.high_score_text))
-        self.outfile.close()
-        
-    def show_start_screen(self):
-        '''Display start screen while waiting for user input'''
-        self.paused = True
-        self.opening_sprites = pg.sprite.Group()
-        self.start_game_block = Block(self)
-        self.opening_sprites.add(self.start_game_block)
+        '''Add the score to the leaderboard, which saves it in the background'''
+        self.leaderboard.submit(self.sim.score)
+        self.high_score = self.leaderboard.best()
 
-        while self.paused:
-            self.screen.fill(WHITE)
-            self.draw_text('No internet', 35, BLACK, round(WIDTH*1/3) + 20, round(HEIGHT*1/3))
-            self.draw_text('Try:', 20, BLACK, round(WIDTH*1/3) + 20, round(HEIGHT*1/3) + 35)
-            self.draw_text('> Checking the network cables, modem, and router', 20, 
-                           BLACK, round(WIDTH*1/3) + 35, round(HEIGHT*1/3) + 55)
-            self.draw_text('> Reconnecting to Wi-Fi', 20, BLACK, 
-                           round(WIDTH*1/3) + 35, round(HEIGHT*1/3) + 75)
-            self.draw_text('ERR_INTERNET_DISCONNECTED', 20, BLACK, round(WIDTH*1/3) + 20,
-                           round(HEIGHT*1/3) + 105)
-            self.draw_text('Hint: Press Spacebar to Start', 20, L_GRAY, round(WIDTH*1/3) + 20,
-                           HEIGHT - 20)
-
-            self.opening_sprites.draw(self.screen)
-            pg.draw.circle(self.screen, BLACK, (self.start_game_block.rect.centerx + 10, 
-                           self.start_game_block.rect.centery - 10), 2)
-            pg.draw.line(self.screen, BLACK, (self.start_game_block.rect.left - 20, HEIGHT - 110),
-                                             (self.start_game_block.rect.left, HEIGHT - 110), 2)
-            pg.draw.line(self.screen, BLACK, (self.start_game_block.rect.right + 20, HEIGHT - 110),
-                                             (self.start_game_block.rect.right, HEIGHT - 110), 2)
-            pg.display.flip()
-
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    self.paused = False
-                    if self.playing:
-                        self.playing = False
-                    self.running = False
+    def show_start_screen(self, wait=True):
+        """Display start screen while waiting for user input
 
-                elif event.type == pg.KEYDOWN:
-                    if event.key == pg.K_SPACE:
-                        self.paused = False
+        Args:
+            wait (bool): wait for the spacebar, False only shows the screen
+        """
+        # the start screen never changes, so it is only drawn once
+        if self.start_screen is None:
+            self.render_start_screen()
+        self.screen.blit(self.start_screen, (0, 0))
+        pg.display.flip()
+        self.assets.mark('start_screen')
+        # the sounds are decoded in the background while the player looks at the start screen
+        self.assets.load_sounds()
+        if wait:
+            self.wait_for_start(self.hint_rect)
+
+    def render_start_screen(self):
+        '''Draw the start screen and keep a copy of it'''
+        self.start_game_block = Block(self)
+        self.screen.fill(WHITE)
+        self.draw_text('No internet', 35, BLACK, round(WIDTH*1/3) + 20, round(HEIGHT*1/3))
+        self.draw_text('Try:', 20, BLACK, round(WIDTH*1/3) + 20, round(HEIGHT*1/3) + 35)
+        self.draw_text('> Checking the network cables, modem, and router', 20, 
+                       BLACK, round(WIDTH*1/3) + 35, round(HEIGHT*1/3) + 55)
+        self.draw_text('> Reconnecting to Wi-Fi', 20, BLACK, 
+                       round(WIDTH*1/3) + 35, round(HEIGHT*1/3) + 75)
+        self.draw_text('ERR_INTERNET_DISCONNECTED', 20, BLACK, round(WIDTH*1/3) + 20,
+                       round(HEIGHT*1/3) + 105)
+        self.hint_rect = self.draw_text('Hint: Press Spacebar to Start', 20, L_GRAY, round(WIDTH*1/3) + 20,
+                                        HEIGHT - 20)
+
+        self.screen.blit(self.start_game_block.image, self.start_game_block.rect)
+        pg.draw.circle(self.screen, BLACK, (self.start_game_block.rect.centerx + 10, 
+                       self.start_game_block.rect.centery - 10), 2)
+        pg.draw.line(self.screen, BLACK, (self.start_game_block.rect.left - 20, HEIGHT - 110),
+                                         (self.start_game_block.rect.left, HEIGHT - 110), 2)
+        pg.draw.line(self.screen, BLACK, (self.start_game_block.rect.right + 20, HEIGHT - 110),
+                                         (self.start_game_block.rect.right, HEIGHT - 110), 2)
+        self.start_screen = self.screen.copy()
 
     def show_end_screen(self):
         '''Display end game screen while waiting for user input'''
-        self.paused = True
-        self.hit_sound.play()
+        self.assets.play('hit')
+        self.save_replay()
         self.write_highscores()
 
+        self.draw_text('G  A  M  E    O  V  E  R', 35, L_GRAY, round(WIDTH*1/3) +20, HEIGHT//2 - 15)
+        pg.draw.circle(self.screen, BLACK, (self.block.rect.centerx + 10, self.block.rect.centery - 10), 8, 2)
+        pg.draw.circle(self.screen, BLACK, (self.block.rect.centerx + 10, self.block.rect.centery - 10), 2)
+        pg.display.flip()
+        self.wait_for_start()
+
+    def wait_for_start(self, blink_rect=None):
+        """Sleep until the spacebar is pressed, only redrawing the screen when something changes.
+
+        Args:
+            blink_rect (Rect): area of the screen that blinks every ATTRACT_BLINK ms to draw attention
+        """
+        self.paused = True
+        # copy of the finished screen, used to redraw it when needed
+        still = self.screen.copy()
+        blink_on = True
+        if blink_rect is not None and ATTRACT_BLINK:
+            pg.time.set_timer(ATTRACT_EVENT, ATTRACT_BLINK)
+        # only the start screen plays demos
+        if blink_rect is not None and ATTRACT_DEMO:
+            pg.time.set_timer(DEMO_EVENT, ATTRACT_DEMO * 1000)
+
         while self.paused:
-            self.draw_text('G  A  M  E    O  V  E  R', 35, L_GRAY, round(WIDTH*1/3) +20, HEIGHT//2 - 15)
-            pg.draw.circle(self.screen, BLACK, (self.block.rect.centerx + 10, self.block.rect.centery - 10), 8, 2)
-            pg.draw.circle(self.screen, BLACK, (self.block.rect.centerx + 10, self.block.rect.centery - 10), 2)
-            pg.display.flip()
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
+            # blocks without using the CPU until something happens
+            event = pg.event.wait()
+            if event.type == pg.QUIT:
+                self.paused = False
+                self.playing = False
+                self.running = False
+
+            elif event.type == pg.KEYDOWN:
+                if event.key == pg.K_SPACE:
                     self.paused = False
-                    if self.playing:
-                        self.playing = False
-                    self.running = False
 
-                elif event.type == pg.KEYDOWN:
-                    if event.key == pg.K_SPACE:
-                        self.paused = False
+            elif event.type == ATTRACT_EVENT:
+                blink_on = not blink_on
+                if blink_on:
+                    self.screen.blit(still, blink_rect, blink_rect)
+                else:
+                    self.screen.fill(WHITE, blink_rect)
+                pg.display.update(blink_rect)
+
+            elif event.type == DEMO_EVENT:
+                # one demo at a time (pygame 1.9 timers cannot be told to fire only once)
+                pg.time.set_timer(DEMO_EVENT, 0)
+                pg.time.set_timer(ATTRACT_EVENT, 0)
+                self.play_demo()
+                if not self.running:
+                    # the window was closed during the demo
+                    self.paused = False
+                elif self.paused:
+                    # the demo ran out, back to the start screen until the next one
+                    blink_on = True
+                    self.screen.blit(still, (0, 0))
+                    pg.display.flip()
+                    if ATTRACT_BLINK:
+                        pg.time.set_timer(ATTRACT_EVENT, ATTRACT_BLINK)
+                    pg.time.set_timer(DEMO_EVENT, ATTRACT_DEMO * 1000)
+
+            elif event.type == pg.VIDEOEXPOSE:
+                # the window was uncovered, put the whole screen back
+                self.screen.blit(still, (0, 0))
+                pg.display.flip()
+
+        pg.time.set_timer(ATTRACT_EVENT, 0)
+        pg.time.set_timer(DEMO_EVENT, 0)
+
+    def play_demo(self):
+        '''Let the Autopilot play a game until it ends, runs out of time or the spacebar is pressed'''
+        autopilot = Autopilot()
+        self.controller = lambda game: autopilot(game.sim)
+        self.demo = True
+        self.reset()
+        try:
+            self.run()
+        finally:
+            self.demo = False
+            self.controller = None
+        # the input of a demo is the autopilot's, not the player's
+        self.jump_held = False
 
     def draw_text(self, text, size, color, x, y):
         """Draw text to screen
@@ -317,22 +572,41 @@ class Game(object):
             color (tuple): RGB color value of font to screen
             x (int): x position of text on screen
             y (int): y position of text on screen
+
+        Returns:
+            Rect: area of the screen covered by the text
         """        
-        font = pg.font.Font(self.font_name, size)
-        text_surface = font.render(text, False, color)
+        text_surface = self.text.render(text, self.font_name, size, color)
         text_rect = text_surface.get_rect()
         text_rect.left = x
         text_rect.centery = y
         self.screen.blit(text_surface, text_rect)
+        return text_rect
 
 
 if __name__ == "__main__":
-    g = Game()
-    g.show_start_screen()
+    g = Game(LAUNCH)
+    # --startup shows the start screen, prints how long it took to get there and quits
+    startup_only = '--startup' in sys.argv[1:]
+    # --record saves a clip of every game to RECORD_DIR
+    g.record_games = '--record' in sys.argv[1:]
+    if '--telemetry' in sys.argv[1:] and g.telemetry is None:
+        g.telemetry = TelemetryLog()
+    g.show_start_screen(wait=not startup_only)
+    g.assets.wait()
+    if startup_only:
+        print(json.dumps(g.assets.startup))
+        g.running = False
+    else:
+        g.assets.write_startup()
     # this loop will continue to replay game if the user so chooses
     while g.running:
         g.new_game()
         if g.running:
             g.show_end_screen()
 
+    g.finish_recordings()
+    if g.telemetry is not None:
+        g.telemetry.close()
+    g.leaderboard.close()
     pg.quit()
\ No newline at end of file
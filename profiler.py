@@ -0,0 +1,135 @@
+# Frame profiler: times every phase of every frame into a ring buffer, draws a
+# live overlay and exports the recorded frames as a Chrome trace file
+# (open it in chrome://tracing or https://ui.perfetto.dev).
+from array import array
+import json
+import time
+import pygame as pg
+from setting import *
+
+PHASES = ('events', 'physics', 'collision', 'spawning', 'scoring', 'sprites', 'draw')
+
+
+class FrameProfiler(object):
+    """FrameProfiler records how long each phase of the last few hundred frames took.
+
+    Every frame calls begin(), then mark() at the end of each phase, then end().
+    Timings go into preallocated arrays, so profiling allocates nothing and
+    can stay on all the time.
+
+    Args:
+        size (int): number of frames kept in the ring buffer
+        fps (int): frame rate the game aims for, used to count dropped frames
+
+    Attributes:
+        phases (dict): per phase, seconds each frame spent in it
+        starts (array): time each frame started
+        frames (array): total time of each frame
+        index (int): slot of the frame being recorded
+        count (int): number of frames recorded so far
+        dropped (int): number of frames that started later than 1.5 frames after the last one
+        overlay (list): lines of text shown by the overlay
+    """
+    def __init__(self, size=600, fps=FPS):
+        self.size = size
+        self.budget = 1.5 / fps
+        self.phases = {phase: array('d', [0.0]) * size for phase in PHASES}
+        self.starts = array('d', [0.0]) * size
+        self.frames = array('d', [0.0]) * size
+        self.index = 0
+        self.count = 0
+        self.dropped = 0
+        self.start = self.last = time.perf_counter()
+        self.overlay = []
+
+    def begin(self):
+        '''Start timing a frame'''
+        now = time.perf_counter()
+        if self.count and now - self.start > self.budget:
+            self.dropped += 1
+        self.start = self.last = now
+        self.starts[self.index] = now
+        for values in self.phases.values():
+            values[self.index] = 0.0
+
+    def mark(self, phase):
+        '''Record the time since the last mark as time spent in phase'''
+        now = time.perf_counter()
+        self.phases[phase][self.index] += now - self.last
+        self.last = now
+
+    def end(self):
+        '''Finish timing a frame and move on to the next slot of the ring buffer'''
+        self.frames[self.index] = time.perf_counter() - self.start
+        self.index = (self.index + 1) % self.size
+        self.count += 1
+
+    def recorded(self):
+        '''Return the slots of the recorded frames, oldest first'''
+        if self.count < self.size:
+            return range(self.count)
+        return [(self.index + n) % self.size for n in range(self.size)]
+
+    def percentile(self, q):
+        '''Return the q-th percentile of the recorded frame times in milliseconds'''
+        values = sorted(self.frames[n] for n in self.recorded())
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(q / 100 * len(values)))] * 1000
+
+    def update_overlay(self, fps, counts):
+        """Work out the lines of text shown by the overlay.
+
+        Args:
+            fps (float): current frames per second
+            counts (dict): number of live sprites per group
+        """
+        self.overlay = ['FPS %.0f' % fps,
+                        'frame p50 %.2f ms  p99 %.2f ms' % (self.percentile(50), self.percentile(99)),
+                        'dropped frames %d' % self.dropped]
+        self.overlay.append('  '.join('%s %d' % item for item in counts.items()))
+        last = (self.index - 1) % self.size
+        self.overlay.append('  '.join('%s %.2f' % (phase, values[last] * 1000)
+                                      for phase, values in self.phases.items()))
+
+    def draw_overlay(self, surface, text, font_name):
+        """Draw the overlay in the top left corner.
+
+        Args:
+            surface (Surface): surface to draw on
+            text (TextRenderer): renderer used for the lines of text
+            font_name (str): font used for the text
+
+        Returns:
+            Rect: area of the surface covered by the overlay
+        """
+        rect = pg.Rect(5, 5, 0, 0)
+        lines = [text.render(line, font_name, 16, BLACK) for line in self.overlay]
+        for line in lines:
+            rect.width = max(rect.width, line.get_width() + 10)
+            rect.height += line.get_height()
+        rect.height += 10
+        surface.fill(CLOUD_GREY, rect)
+        y = rect.top + 5
+        for line in lines:
+            surface.blit(line, (rect.left + 5, y))
+            y += line.get_height()
+        return rect
+
+    def export(self, path):
+        """Write the recorded frames to a Chrome trace event file.
+
+        Args:
+            path (str): file to write the trace to
+        """
+        events = []
+        for n in self.recorded():
+            start = self.starts[n] * 1e6
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 1,
+                           'ts': start, 'dur': self.frames[n] * 1e6})
+            for phase, values in self.phases.items():
+                events.append({'name': phase, 'ph': 'X', 'pid': 1, 'tid': 1,
+                               'ts': start, 'dur': values[n] * 1e6})
+                start += values[n] * 1e6
+        with open(path, 'w') as outfile:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, outfile)
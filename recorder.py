@@ -0,0 +1,290 @@
+# Gameplay recording. Drawn frames are copied into a ring of preallocated
+# surfaces and written out by an encoder thread, so recording never holds up
+# the game: when the encoder falls behind and the ring is full, frames are
+# dropped (and counted) instead of waiting for it.
+#
+# Clips are raw RGB video (.rgb) or, with Pillow installed (`pip install
+# pillow`), GIFs (.gif). Raw video plays with ffmpeg:
+#
+#   ffplay -f rawvideo -pixel_format rgb24 -video_size 400x200 -framerate 30 clip.rgb
+#
+# Recorded replays are drawn into clips without a window:
+#
+#   python recorder.py replays/best.brr --output best.gif
+import argparse
+import itertools
+import os
+import queue
+import sys
+import threading
+import time
+import pygame as pg
+from setting import *
+from replay import InputLog
+
+try:
+    from PIL import Image, ImageChops, GifImagePlugin
+except ImportError:
+    # no GIFs without Pillow, raw video still works
+    Image = None
+
+FORMATS = ('.gif', '.rgb')
+
+
+def clip_path(directory=RECORD_DIR):
+    '''Return a new file name for a clip, in the format RECORD_FORMAT if it can be written'''
+    extension = '.gif' if RECORD_FORMAT == 'gif' and Image is not None else '.rgb'
+    stamp = time.strftime('clip-%Y%m%d-%H%M%S')
+    for n in itertools.count(1):
+        # clips started within the same second (or by another game) get -2, -3, ...
+        path = os.path.join(directory, stamp + ('-%d' % n if n > 1 else '') + extension)
+        try:
+            # the empty file keeps the name taken until the encoder writes the clip
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            continue
+        return path
+
+
+class Recorder(object):
+    """Recorder copies drawn frames into a ring buffer and encodes them on a thread.
+
+    Args:
+        path (str): file to write the clip to, ending in .gif or .rgb
+        size (tuple): width and height of the frames captured
+        scale (int): frames are scaled down by this factor
+        every (int): keep one frame for every this many frames of the game
+        capacity (int): number of frames the ring holds for the encoder
+        seconds (float): longest clip, None for no limit
+
+    Attributes:
+        path (str): file the clip is written to
+        size (tuple): width and height of the frames in the clip
+        captured (int): frames handed to the encoder
+        dropped (int): frames lost because the encoder was too far behind
+        written (int): frames written to the clip, repeats included
+    """
+    def __init__(self, path, size=(WIDTH, HEIGHT), scale=RECORD_SCALE, every=RECORD_EVERY,
+                 capacity=RECORD_BUFFER, seconds=RECORD_SECONDS):
+        self.format = os.path.splitext(path)[1].lower()
+        if self.format not in FORMATS:
+            raise ValueError('cannot record %s, use one of %s' % (path, ', '.join(FORMATS)))
+        if self.format == '.gif' and Image is None:
+            raise ValueError('recording GIFs needs Pillow (pip install pillow), record .rgb instead')
+        self.path = path
+        self.scale = scale
+        self.size = (size[0] // scale, size[1] // scale)
+        self.every = every
+        self.max_frames = None if seconds is None else int(seconds * FPS / every)
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        # a frame of the clip is due every time frame // every goes up
+        self.last_tick = None
+        self.missed_tick = None
+        # every surface of the ring is made up front, capturing a frame allocates nothing
+        self.ring = [pg.Surface(self.size) for _ in range(capacity)]
+        self.free = queue.Queue()
+        for slot in range(capacity):
+            self.free.put(slot)
+        # (slot, number of frames of the game it stands for), None when the clip is over
+        self.filled = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self.encoder, name='recorder', daemon=True)
+        self.thread.start()
+
+    def capture(self, surface, frame, wait=False):
+        """Copy a drawn frame into the ring, if a frame of the clip is due.
+
+        Args:
+            surface (Surface): screen the frame was drawn on
+            frame (int): frame of the game the screen shows
+            wait (bool): wait for the encoder instead of dropping the frame when the ring is full
+
+        Returns:
+            bool: False once the clip is as long as it can be
+        """
+        if self.max_frames is not None and self.captured + self.dropped >= self.max_frames:
+            return False
+        tick = frame // self.every
+        if tick == self.last_tick:
+            return True
+        try:
+            slot = self.free.get(wait)
+        except queue.Empty:
+            # the encoder is behind: try again on the next drawn frame, the
+            # frame of the clip is only lost if no slot frees up in time
+            if tick != self.missed_tick:
+                self.missed_tick = tick
+                self.dropped += 1
+            return True
+        if self.scale == 1:
+            self.ring[slot].blit(surface, (0, 0))
+        else:
+            pg.transform.scale(surface, self.size, self.ring[slot])
+        # a frame that comes after dropped or skipped ones is shown for longer, so the clip keeps time
+        repeats = 1 if self.last_tick is None else tick - self.last_tick
+        self.last_tick = tick
+        self.captured += 1
+        self.filled.put((slot, repeats))
+        return True
+
+    def encoder(self):
+        '''Background thread: write every frame put in the ring to the clip'''
+        palette = None
+        last = None
+        # GIFs count time in hundredths of a second, rounding is carried over so the clip keeps time
+        elapsed = 0.0
+        shown = 0
+        outfile = None
+        try:
+            if self.format == '.rgb':
+                outfile = open(self.path, 'wb')
+            while True:
+                item = self.filled.get()
+                if item is None:
+                    break
+                slot, repeats = item
+                pixels = pg.image.tostring(self.ring[slot], 'RGB')
+                # the slot is free again as soon as its pixels are copied out
+                self.free.put(slot)
+                self.written += repeats
+                if self.format == '.rgb':
+                    # raw video has a fixed frame rate, so a frame that stands for more is written again
+                    for _ in range(repeats):
+                        outfile.write(pixels)
+                    continue
+                image = Image.frombytes('RGB', self.size, pixels)
+                # the game only has a few colors, the palette of the first frame fits them all
+                if palette is None:
+                    palette = image.convert('P', palette=Image.ADAPTIVE, colors=64)
+                    image = palette
+                    outfile = open(self.path, 'wb')
+                    # the header holds the palette of every frame and makes the clip loop
+                    header, _ = GifImagePlugin.getheader(image, info={'loop': 0})
+                    outfile.writelines(header)
+                else:
+                    image = image.quantize(palette=palette)
+                elapsed += repeats * self.every * FRAME_TIME
+                duration = round(elapsed / 10) * 10 - shown
+                shown += duration
+                # only the part of the frame that changed is stored, over the frame before it
+                # (a frame where nothing changed still needs one pixel)
+                if last is None:
+                    box = (0, 0) + self.size
+                else:
+                    box = ImageChops.difference(image, last).getbbox() or (0, 0, 1, 1)
+                last = image
+                # every frame goes to the file as soon as it is encoded, so
+                # clips of any length are made in the same memory
+                outfile.writelines(GifImagePlugin.getdata(image.crop(box), box[:2], duration=duration))
+            if outfile is not None:
+                if self.format == '.gif':
+                    # trailer
+                    outfile.write(b';')
+                outfile.close()
+            elif os.path.isfile(self.path) and not os.path.getsize(self.path):
+                # a GIF without frames, do not leave the name taken by clip_path() behind
+                os.remove(self.path)
+        except Exception as error:
+            # keep the game running, the error is reported by close()
+            self.error = error
+            if outfile is not None:
+                outfile.close()
+            item = self.filled.get()
+            while item is not None:
+                self.free.put(item[0])
+                item = self.filled.get()
+
+    def stop(self):
+        '''Stop recording, the encoder finishes the clip in the background'''
+        self.filled.put(None)
+
+    def close(self):
+        """Stop recording and wait for the clip to be written.
+
+        Raises:
+            Exception: whatever went wrong writing the clip
+        """
+        if self.thread.is_alive():
+            self.stop()
+            self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def summary(self):
+        '''Return what was recorded as a short string'''
+        return '%s: %dx%d, %d frames at %.0f fps, %d dropped' % (
+            self.path, self.size[0], self.size[1], self.written, FPS / self.every, self.dropped)
+
+
+def render_replay(log, path, scale=RECORD_SCALE, every=RECORD_EVERY, seconds=None):
+    """Draw a recorded game into a clip without a window, as fast as the CPU allows.
+
+    Args:
+        log (InputLog): the recorded game
+        path (str): file to write the clip to, ending in .gif or .rgb
+        scale (int): frames are scaled down by this factor
+        every (int): keep one frame for every this many frames of the game
+        seconds (float): only record the last this many seconds of the game, None for all of it
+
+    Returns:
+        tuple: (Recorder, score the replayed game reached)
+    """
+    # nothing is shown or played, so no window or sound device is needed
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    # imported here so recording live games does not import the game twice
+    from main import Game
+    game = Game()
+    inputs = iter(log)
+    game.controller = lambda game: next(inputs)
+    game.reset(log.seed)
+    game.playing = True
+    first = 0 if seconds is None else len(log) - int(seconds * FPS)
+    recorder = Recorder(path, scale=scale, every=every, seconds=None)
+    try:
+        game.draw()
+        for frame in range(len(log)):
+            game.events()
+            game.update()
+            # frames before the clip starts are simulated but never drawn
+            if frame + 1 >= first:
+                # nothing was drawn for a while, start over with the whole screen
+                game.full_redraw = game.full_redraw or frame + 1 == first
+                game.draw()
+                # offline there is no hurry, wait for the encoder rather than drop frames
+                recorder.capture(game.screen, game.sim.frame, wait=True)
+            if not game.playing:
+                break
+        recorder.close()
+    finally:
+        game.leaderboard.close()
+        game.sim.close()
+        pg.quit()
+    return recorder, game.sim.score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Draw recorded BLOCK RUN games into GIF or raw video clips.')
+    parser.add_argument('replay', help='replay file to draw')
+    parser.add_argument('--output', help='clip to write, .gif or .rgb (default: the replay name with .gif, '
+                                         'or .rgb without Pillow)')
+    parser.add_argument('--scale', type=int, default=RECORD_SCALE, help='scale frames down by this factor')
+    parser.add_argument('--every', type=int, default=RECORD_EVERY, help='keep one in this many frames')
+    parser.add_argument('--seconds', type=float, help='only draw the last this many seconds of the game')
+    args = parser.parse_args(argv)
+
+    log = InputLog.load(args.replay)
+    output = args.output or os.path.splitext(args.replay)[0] + ('.gif' if Image is not None else '.rgb')
+    start = time.perf_counter()
+    recorder, score = render_replay(log, output, args.scale, args.every, args.seconds)
+    print('%s  (score %d, drawn in %.1f s)' % (recorder.summary(), score, time.perf_counter() - start))
+    if score != log.score:
+        print('warning: the replay reached score %d, it recorded %d' % (score, log.score))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# Recorded games. A game is fully decided by its seed and whether the jump key
+# was held on each frame, so a replay only stores those (one bit per frame)
+# and can be re-simulated without a window at full CPU speed.
+#
+#   python replay.py replays/best.brr
+import argparse
+import struct
+import sys
+import time
+from leaderboard import atomic_write
+from simulation import Simulation
+
+MAGIC = b'BRRP'
+# version 2: obstacles come from levelgen, so version 1 replays no longer play out the same
+VERSION = 2
+# magic, version, seed, number of frames, final score
+HEADER = struct.Struct('<4sHQII')
+
+
+class InputLog(object):
+    """InputLog stores the jump input of every frame of a game, one bit per frame.
+
+    Args:
+        seed (int): seed of the recorded game
+        frames (int): number of frames already in bits
+        bits (bytearray): packed jump inputs, first frame in the lowest bit
+        score (int): final score of the recorded game
+
+    Attributes:
+        seed (int): seed of the recorded game
+        frames (int): number of frames recorded
+        bits (bytearray): packed jump inputs
+        score (int): final score of the recorded game
+    """
+    def __init__(self, seed, frames=0, bits=None, score=0):
+        self.seed = seed
+        self.frames = frames
+        self.bits = bytearray() if bits is None else bits
+        self.score = score
+
+    def __len__(self):
+        return self.frames
+
+    def __iter__(self):
+        bits = self.bits
+        for frame in range(self.frames):
+            yield bool(bits[frame >> 3] & (1 << (frame & 7)))
+
+    def append(self, jump):
+        '''Record the jump input of the next frame'''
+        if not self.frames & 7:
+            self.bits.append(0)
+        if jump:
+            self.bits[-1] |= 1 << (self.frames & 7)
+        self.frames += 1
+
+    def dump(self):
+        '''Return the log as the contents of a replay file'''
+        return HEADER.pack(MAGIC, VERSION, self.seed, self.frames, self.score) + bytes(self.bits)
+
+    def save(self, path):
+        '''Write the log to a file, replacing it atomically so a crash never leaves half a replay'''
+        atomic_write(path, self.dump())
+
+    @classmethod
+    def load(cls, path):
+        """Read a log written by save().
+
+        Args:
+            path (str): file to read
+
+        Returns:
+            InputLog: the recorded game
+
+        Raises:
+            ValueError: if the file is not a replay this version can read
+        """
+        with open(path, 'rb') as infile:
+            data = infile.read()
+        if len(data) < HEADER.size:
+            raise ValueError('%s is too short to be a replay' % path)
+        magic, version, seed, frames, score = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a version %d replay' % (path, VERSION))
+        bits = bytearray(data[HEADER.size:])
+        if len(bits) != (frames + 7) // 8:
+            raise ValueError('%s is truncated' % path)
+        return cls(seed, frames, bits, score)
+
+
+def replay(log):
+    """Re-simulate a recorded game as fast as possible.
+
+    Args:
+        log (InputLog): the recorded game
+
+    Returns:
+        Simulation: the simulation after the last recorded frame
+    """
+    sim = Simulation(log.seed)
+    step = sim.step
+    for jump in log:
+        if not step(jump):
+            break
+    return sim
+
+
+def verify(log, sim=None):
+    """Check that a recorded game really reaches the score it claims.
+
+    Args:
+        log (InputLog): the recorded game
+        sim (Simulation): the game already re-simulated by replay(log), re-simulated here if None
+
+    Returns:
+        bool: True if the re-simulated game ends on the recorded frame with the recorded score
+    """
+    if sim is None:
+        sim = replay(log)
+    return not sim.playing and sim.frame == log.frames and sim.score == log.score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Re-simulate recorded BLOCK RUN games and check their scores.')
+    parser.add_argument('replays', nargs='+', help='replay files to check')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for path in args.replays:
+        log = InputLog.load(path)
+        start = time.perf_counter()
+        sim = replay(log)
+        elapsed = time.perf_counter() - start
+        ok = verify(log, sim)
+        failed += not ok
+        print('%s: %s  recorded score %d, replayed score %d  (%d frames in %.3f s)' % (
+            path, 'OK' if ok else 'MISMATCH', log.score, sim.score, sim.frame, elapsed))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
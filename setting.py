@@ -5,7 +5,53 @@ TITLE = 'BLOCK RUN'
 WIDTH = 800
 HEIGHT = 400
 FPS = 60
+# length of one simulated frame in milliseconds
+FRAME_TIME = 1000 / FPS
+# frames drawn per second, 0 to draw as many as the display refreshes
+# (the game itself always runs at FPS, whatever this is set to). Only
+# pygame-ce can tell how often that is, with pygame 0 always draws FPS
+# frames a second: set this to the refresh rate of a 120 or 144 Hz display
+RENDER_FPS = 0
+# most frames of the game run per drawn frame, after that the game slows down instead
+MAX_FRAME_SKIP = 5
 FONT_NAME = 'comicsans'
+# only redraw the parts of the screen that changed instead of the whole window
+DIRTY_RECTS = True
+# the start screen hint blinks every ATTRACT_BLINK ms (0 keeps it still)
+ATTRACT_BLINK = 600
+# after ATTRACT_DEMO seconds on the start screen the autopilot plays a demo game, for at most
+# ATTRACT_DEMO_LENGTH seconds (0 for never, so the idle start screen keeps sleeping)
+ATTRACT_DEMO = 0
+ATTRACT_DEMO_LENGTH = 60
+# file the frame profiler trace is written to when F4 is pressed
+PROFILE_TRACE = 'trace.json'
+# folder the replays of the last game and of the best game are saved in
+REPLAY_DIR = 'replays'
+# every launch appends how long it took to show the start screen to this file
+STARTUP_LOG = 'startup.log'
+# folder clips are saved in (F5 starts and stops recording, --record records every game)
+RECORD_DIR = 'recordings'
+# 'gif' (needs Pillow, raw video is recorded without it) or 'rgb' for raw video
+RECORD_FORMAT = 'gif'
+# clips keep one frame for every RECORD_EVERY frames of the game (2: 30 frames a second)
+RECORD_EVERY = 2
+# clips are scaled down by this factor
+RECORD_SCALE = 2
+# frames waiting for the encoder, once it is this far behind frames are dropped
+RECORD_BUFFER = 32
+# longest clip in seconds
+RECORD_SECONDS = 60
+# record telemetry of every frame into TELEMETRY_DIR (python main.py --telemetry turns it on as well)
+TELEMETRY = False
+TELEMETRY_DIR = 'telemetry'
+# frames of telemetry kept in memory before they are written out
+TELEMETRY_BATCH = 4096
+
+# leaderboard settings
+PLAYER_NAME = 'player'
+LEADERBOARD_SIZE = 10
+LEADERBOARD_FILE = 'leaderboard.json'
+LEADERBOARD_LOG = 'leaderboard.log'
 
 # initialize colors
 WHITE = (255,255,255)
@@ -15,6 +61,7 @@ GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 L_GRAY = (125, 125, 125)
 CLOUD_GREY = (240, 240, 240)
+FAR_CLOUD_GREY = (247, 247, 247)
 
 # gravity settings
 GRAVITY = 0.8
@@ -22,6 +69,10 @@ ANTIGRAVITY = -0.3
 
 # player settings
 PLAYER_JUMP = -13
+BLOCK_WIDTH = 50
+BLOCK_HEIGHT = 50
+BLOCK_X = WIDTH*1//4
+GROUND_Y = HEIGHT - 100
 
 # obstacle settings
 OBS_Y_POS = HEIGHT - 100
@@ -29,7 +80,23 @@ OBS_WIDTH = 25
 OBS_SPACING = 40
 ARM_WIDTH = 10
 ARM_HEIGHT = 10
+# starting scroll speed of the obstacles, which grows by 1 every OBS_VEL_CHNG_RT points
+OBS_VELOCITY = 6
+OBS_VEL_CHNG_RT = 200
+# milliseconds between groups of obstacles at the start, going down to OBS_GEN_TIME_MIN as the score goes up
+OBS_GEN_TIME = 1500
+OBS_GEN_TIME_MIN = 700
+
+# bird settings, birds fly at one of BIRD_ALTITUDES (pixels above the ground)
+# and replace BIRD_CHANCE of the groups of obstacles from group BIRD_FIRST_GROUP on
+BIRD_WIDTH = 30
+BIRD_HEIGHT = 20
+BIRD_ALTITUDES = (20, 60)
+BIRD_CHANCE = 0.25
+BIRD_FIRST_GROUP = 30
 
 # cloud settings
 CLOUD_HEIGHT = 15
 CLOUD_WIDTH = 15
+# parallax cloud layers from farthest to nearest: (number of clouds, speed, color)
+CLOUD_LAYERS = [(3, 0.5, FAR_CLOUD_GREY), (4, 1, CLOUD_GREY)]
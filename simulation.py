@@ -0,0 +1,358 @@
+# Headless game rules. Nothing in here touches pygame, so a Simulation can be
+# stepped as fast as the CPU allows with no window, clock or mixer attached.
+import random
+from collections import deque
+from setting import *
+# imported as a module, levelgen.py imports this one as well
+import levelgen
+
+
+# settings a Simulation can be given different values of, with their defaults
+RULES = {
+    'GRAVITY': GRAVITY,
+    'ANTIGRAVITY': ANTIGRAVITY,
+    'PLAYER_JUMP': PLAYER_JUMP,
+    'OBS_SPACING': OBS_SPACING,
+    'OBS_VELOCITY': OBS_VELOCITY,
+    'OBS_VEL_CHNG_RT': OBS_VEL_CHNG_RT,
+}
+
+
+def to_pixel(value):
+    '''Round a float position to a whole pixel the same way pygame rects do'''
+    # pygame rounds halves away from zero; positions here are never negative
+    return int(value + 0.5)
+
+
+def make_rng(seed, stream):
+    """Return the random number generator of one part of a seeded game.
+
+    Every part of the game (obstacle spawning, cactus shapes, clouds) draws from
+    its own stream, so changing how one part uses random numbers does not
+    change what the others do.
+
+    Args:
+        seed (int): seed of the game
+        stream (str): name of the part of the game
+
+    Returns:
+        Random: generator seeded from both
+    """
+    return random.Random('%d:%s' % (seed, stream))
+
+
+def overlaps(ax, ay, aw, ah, bx, by, bw, bh):
+    '''Return True if two rectangles overlap (same test as Rect.colliderect)'''
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+class CactusState(object):
+    """Position and shape of one cactus (body, two arms and two arm bumps)
+
+    Args:
+        x (int): x location of the cactus body in world coordinates
+        height (int): height of the cactus body
+        l_arm (int): bottom y position of the left arm
+        r_arm (int): bottom y position of the right arm
+        l_bump (int): bottom y position of the left arm bump
+        r_bump (int): bottom y position of the right arm bump
+
+    Attributes:
+        parts (tuple): (x offset, bottom, width, height) of every piece of the
+                       cactus, x offset being relative to the cactus body
+        top (int): y position of the highest piece of the cactus
+        bottom (int): y position of the bottom of the cactus
+        left (int): x position of the left edge of the left arm
+        right (int): x position of the right edge of the right arm
+    """
+    # left and right are looked up every frame, and a cactus never moves, so they are worked out once
+    __slots__ = ('x', 'height', 'parts', 'top', 'left', 'right')
+    kind = 'cactus'
+    bottom = OBS_Y_POS
+
+    def __init__(self, x, height, l_arm, r_arm, l_bump, r_bump):
+        self.x = x
+        self.height = height
+        self.parts = ((0, OBS_Y_POS, OBS_WIDTH, height),
+                      (-ARM_WIDTH, l_arm, ARM_WIDTH, ARM_HEIGHT),
+                      (OBS_WIDTH, r_arm, ARM_WIDTH, ARM_HEIGHT),
+                      (-ARM_WIDTH, l_bump, 5, 5),
+                      (OBS_WIDTH + ARM_WIDTH - 5, r_bump, 5, 5))
+        self.top = min(bottom - h for _, bottom, _, h in self.parts)
+        self.left = x - ARM_WIDTH
+        self.right = x + OBS_WIDTH + ARM_WIDTH
+
+    def collides(self, x, y, width, height):
+        '''Return True if any piece of the cactus overlaps the given rectangle'''
+        # one test against the bounding box of the whole cactus rules out almost everything
+        if not overlaps(self.x - ARM_WIDTH, self.top, OBS_WIDTH + 2*ARM_WIDTH, OBS_Y_POS - self.top,
+                        x, y, width, height):
+            return False
+        for dx, bottom, w, h in self.parts:
+            if overlaps(self.x + dx, bottom - h, w, h, x, y, width, height):
+                return True
+        return False
+
+
+class BirdState(object):
+    """Position of one bird flying across the screen
+
+    Args:
+        x (int): x location of the left of the bird in world coordinates
+        altitude (int): height of the bottom of the bird above the ground
+
+    Attributes:
+        parts (tuple): (x offset, bottom, width, height) of the bird
+        top (int): y position of the top of the bird
+        bottom (int): y position of the bottom of the bird
+        left (int): x position of the tip of the beak
+        right (int): x position of the tip of the tail
+    """
+    __slots__ = ('x', 'parts', 'top', 'bottom', 'left', 'right')
+    kind = 'bird'
+
+    def __init__(self, x, altitude):
+        self.x = x
+        self.bottom = GROUND_Y - altitude
+        self.top = self.bottom - BIRD_HEIGHT
+        self.parts = ((0, self.bottom, BIRD_WIDTH, BIRD_HEIGHT),)
+        self.left = x
+        self.right = x + BIRD_WIDTH
+
+    def collides(self, x, y, width, height):
+        '''Return True if the bird overlaps the given rectangle'''
+        return overlaps(self.x, self.top, BIRD_WIDTH, BIRD_HEIGHT, x, y, width, height)
+
+
+class Simulation(object):
+    """Simulation holds the full state of one game and advances it frame by frame
+
+    Time is simulated: every call to step() advances the clock by FRAME_TIME
+    milliseconds no matter how long the call took, and all randomness comes
+    from generators seeded with the game's seed, so the same seed and inputs
+    always produce the same game.
+
+    Obstacles sit still in world coordinates while the whole world scrolls
+    left under the block. A cactus is on screen at x - scroll. What each
+    group of obstacles looks like is decided ahead of time by a LevelGenerator;
+    when the group appears is decided here.
+
+    Args:
+        seed (int): seed of the game, picked at random if None
+        rules (dict): values to use instead of the settings in RULES, keyed by setting name
+        prefetch (bool): generate the groups of obstacles on a worker thread
+
+    Attributes:
+        seed (int): seed of the game
+        rules (dict): value of every setting in RULES used by this simulation
+        level (LevelGenerator): layouts of the groups of obstacles still to come
+        time (float): simulated milliseconds since the game started
+        frame (int): number of frames stepped so far
+        score (int): current score
+        timer (float): time the last group of cacti was generated
+        score_timer (float): time the score was last incremented
+        obs_gen_time (int): time inbetween cactus generations
+        speed (int): distance the world scrolls each frame
+        scroll (int): distance the world has scrolled since the game started
+        block_y (float): y position of the bottom of the block
+        block_vel (float): vertical velocity of the block
+        obstacles (deque): live CactusState and BirdState objects ordered left to right
+        playing (bool): False once the block has hit an obstacle
+        jumped (bool): True if the block left the ground during the last step
+        milestone (bool): True if the last step reached a multiple of 100 points
+        spawned (list): obstacles generated during the last step
+        removed (list): obstacles that scrolled off screen during the last step
+        uncleared (int): groups of obstacles spawned that no jump gets past, see levelgen.group_specs()
+    """
+    def __init__(self, seed=None, rules=None, prefetch=False):
+        unknown = set(rules or ()) - set(RULES)
+        if unknown:
+            raise ValueError('cannot change %s, only %s' % (', '.join(sorted(unknown)), ', '.join(RULES)))
+        self.rules = dict(RULES, **(rules or {}))
+        # kept as attributes, which are as quick to look up as the settings themselves
+        self.gravity = self.rules['GRAVITY']
+        self.antigravity = self.rules['ANTIGRAVITY']
+        self.player_jump = self.rules['PLAYER_JUMP']
+        self.obs_spacing = self.rules['OBS_SPACING']
+        self.obs_velocity = self.rules['OBS_VELOCITY']
+        self.obs_vel_chng_rt = self.rules['OBS_VEL_CHNG_RT']
+        self.prefetch = prefetch
+        self.level = None
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        '''Put the simulation back at the start of a new game'''
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+        self.close()
+        self.level = levelgen.LevelGenerator(seed, self.rules, prefetch=self.prefetch)
+        self.time = 0.0
+        self.frame = 0
+        self.score = 0
+        self.timer = 0
+        self.score_timer = 0
+        self.obs_gen_time = OBS_GEN_TIME
+        self.speed = self.obs_velocity
+        self.scroll = 0
+        self.block_y = float(GROUND_Y)
+        self.block_vel = 0.0
+        # Cacti never move relative to each other, so new ones go
+        # on the right end and old ones leave from the left end
+        self.obstacles = deque()
+        self.playing = True
+        self.jumped = False
+        self.milestone = False
+        self.spawned = []
+        self.removed = []
+        self.uncleared = 0
+
+    def close(self):
+        '''Stop generating obstacles in the background'''
+        if self.level is not None:
+            self.level.close()
+
+    @property
+    def block_bottom(self):
+        '''Bottom of the block in whole pixels'''
+        return to_pixel(self.block_y)
+
+    def on_ground(self):
+        '''Return True if the block is standing on the ground'''
+        # Same as moving the block down one pixel and checking for a platform
+        bottom = self.block_bottom + 1
+        return bottom > GROUND_Y and bottom - BLOCK_HEIGHT < GROUND_Y + 2
+
+    def step(self, jump, profiler=None):
+        """Advance the game by one frame.
+
+        Args:
+            jump (bool): True if the jump key is held down during this frame
+            profiler (FrameProfiler): if given, each part of the step is timed
+
+        Returns:
+            bool: False once the game is over
+        """
+        self.jumped = False
+        self.milestone = False
+        del self.spawned[:]
+        del self.removed[:]
+        self.frame += 1
+        self.time += FRAME_TIME
+
+        # Jumping is only possible from the ground (keeps from double jumping)
+        if jump and self.on_ground():
+            self.block_vel = self.player_jump
+            self.jumped = True
+
+        self.move(jump)
+        if profiler is not None:
+            profiler.mark('physics')
+        self.collide()
+        if profiler is not None:
+            profiler.mark('collision')
+        self.spawn()
+        if profiler is not None:
+            profiler.mark('spawning')
+        self.tally()
+        if profiler is not None:
+            profiler.mark('scoring')
+        return self.playing
+
+    def move(self, jump):
+        '''Scroll the world under the block and move the block under gravity'''
+        # velocity goes up by one every OBS_VEL_CHNG_RT points
+        self.speed = self.obs_velocity + self.score // self.obs_vel_chng_rt
+        self.scroll += self.speed
+
+        # If holding down spacebar, it will lessen the effects of gravity
+        # giving the effect of a more forceful jump!
+        if jump:
+            self.block_vel += self.antigravity
+        self.block_vel += self.gravity
+        self.block_y += self.block_vel + 0.5*self.gravity
+
+        # Land on the ground platform (2 pixels tall, starting at GROUND_Y)
+        bottom = self.block_bottom
+        if bottom > GROUND_Y and bottom - BLOCK_HEIGHT < GROUND_Y + 2:
+            self.block_y = float(GROUND_Y)
+            self.block_vel = 0.0
+
+    def collide(self):
+        '''End the game on contact and drop cacti that scrolled off screen'''
+        top = self.block_bottom - BLOCK_HEIGHT
+        left = BLOCK_X - BLOCK_WIDTH//2 + self.scroll
+        for cactus in self.nearby(left, left + BLOCK_WIDTH):
+            if cactus.collides(left, top, BLOCK_WIDTH, BLOCK_HEIGHT):
+                self.playing = False
+                break
+
+        while self.obstacles and self.obstacles[0].right < self.scroll:
+            self.removed.append(self.obstacles.popleft())
+
+    def nearby(self, left, right):
+        """Find the obstacles that reach into a span of columns.
+
+        Args:
+            left (int): world x position of the left edge of the span
+            right (int): world x position just past the right edge of the span
+
+        Returns:
+            list: obstacles overlapping the span, ordered left to right
+        """
+        obstacles = self.obstacles
+        # bisect for the first cactus whose right edge is past the left edge of the span
+        lo, hi = 0, len(obstacles)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if obstacles[mid].right <= left:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        while lo < len(obstacles) and obstacles[lo].left < right:
+            found.append(obstacles[lo])
+            lo += 1
+        return found
+
+    def spawn(self):
+        '''Generate new groups of obstacles off screen as time goes by'''
+        # Every 200 game points reduct time inbetween cactus generations up to a limit of 700ms
+        if self.score % 200 == 0 and self.obs_gen_time > OBS_GEN_TIME_MIN:
+            self.obs_gen_time -= 50
+
+        if self.time - self.timer > self.obs_gen_time:
+            # the layout of the group was worked out ahead of time
+            spec = self.level.next()
+            obs_x_pos = spec.offset + self.scroll
+            self.uncleared += not spec.cleared
+            if spec.kind == 'bird':
+                bird = BirdState(obs_x_pos, spec.altitude)
+                self.obstacles.append(bird)
+                self.spawned.append(bird)
+            # Generate obstacles in groups 1-3 spaced apart by amt spacing.
+            for n, layout in enumerate(spec.cacti, 1):
+                cactus = self.generate_cacti(obs_x_pos, layout, n)
+                self.obstacles.append(cactus)
+                self.spawned.append(cactus)
+            self.timer = self.time
+
+    def tally(self):
+        '''Score is based on game survival time'''
+        if self.time - self.score_timer > 100:
+            self.score += 1
+            self.score_timer = self.time
+            self.milestone = self.score % 100 == 0
+
+    def generate_cacti(self, obs_x_pos, layout, n):
+        """Generate cactus obstacle off screen.
+
+        Args:
+            obs_x_pos (int): world x position of the group of cacti
+            layout (tuple): (height, l_arm, r_arm, l_bump, r_bump) picked by the level generator
+            n (int): the nth number of cactus in a grouping. Used to determine spacing.
+
+        Returns:
+            CactusState: the new cactus
+        """
+        return CactusState(obs_x_pos + self.obs_spacing * (n - 1), *layout)
@@ -1,7 +1,34 @@
 # Contains all our game sprites.
+import random
 import pygame as pg
 from setting import *
-vec = pg.math.Vector2
+from assets import to_display
+# imported as modules, the way simulation.py and levelgen.py import each other
+import levelgen
+import simulation
+
+# width of the outline of hollow sprites
+INNER_BORDER_WIDTH = 3
+# color treated as see-through in composite sprites
+COLORKEY = (255, 0, 255)
+
+
+def hollow_surface(width, height, color):
+    """Render a black outlined rectangle filled with color.
+
+    Args:
+        width (int): width of the surface
+        height (int): height of the surface
+        color (tuple): RGB color value inside the outline
+
+    Returns:
+        Surface: the rendered rectangle
+    """
+    image = pg.Surface((width, height))
+    image.fill(color, rect=(INNER_BORDER_WIDTH, INNER_BORDER_WIDTH,
+                            width - 2*INNER_BORDER_WIDTH, height - 2*INNER_BORDER_WIDTH))
+    return image
+
 
 class Platform(pg.sprite.Sprite):
     """Platform objects are stationary platforms the player can stand on
@@ -21,98 +48,211 @@ class Platform(pg.sprite.Sprite):
         pg.sprite.Sprite.__init__(self)
         self.width = width
         self.height = height
-        self.image = pg.Surface((self.width, self.height))
+        self.image = to_display(pg.Surface((self.width, self.height)))
         self.rect = self.image.get_rect()
         self.image.fill(color)
         self.rect.x = x
         self.rect.y = y
 
 
-class Obstacles(Platform):
-    """Obstacles objects move across screen and can make contact with player.
+class Cactus(pg.sprite.Sprite):
+    """Cactus displays a whole simulated cactus (body, arms and bumps) as one sprite.
+    Birds are displayed by the same sprite with a different image.
 
     Args:
-        x (int): x location of obstacle
-        y (int): y location of obstacle
-        width (int): width of obstacle
-        height (int): height of obstacle
-        color (tuple): RGB color value of obstacle
         game (Game): instance of game currently being played
 
-    Attributes:      
+    Attributes:
         image (Surface): surface displayed on screen
         rect (tuple): rectangular positioning of image
-        inner_border_width (int): inner border width of block
-        inner_width (int): width of inner rect created by border width
-        inner_height (int): widtheighth of inner rect created by border width
-        arm_image (Surface): surface displayed on screen
-        arm_rects (tuple): rectangular positioning of cactus arms
-        velocity (int): movement speed across screen
-        vel_chng_rt (int): amount score must increment before changing velo
-    """    
-    def __init__(self, x, y, width, height, color, game):
-        super().__init__(x, y, width, height, color)
+        cactus (CactusState): simulated cactus (or BirdState) being displayed
+    """
+    def __init__(self, game):
+        pg.sprite.Sprite.__init__(self)
         self.game = game
-        self.image = pg.Surface((self.width, self.height))
-        self.rect = self.image.get_rect()
-        self.inner_border_width = 3
-        self.inner_width = self.width - 2*self.inner_border_width
-        self.inner_height = self.height - 2*self.inner_border_width
-        self.image.fill(color, rect=(self.rect.x + self.inner_border_width, 
-                                     self.rect.top + self.inner_border_width, self.inner_width, 
-                                     self.inner_height))
-        self.rect.x = x
-        self.rect.bottom = y
+        self.image = None
+        self.rect = pg.Rect(0, 0, 0, 0)
+        self.cactus = None
 
-        self.arm_image = pg.Surface((self.width//2, 5))
-        self.arm_rects = self.arm_image.get_rect()
-        self.arm_image.fill(RED)
-        self.arm_rects.right = self.rect.left
-        self.arm_rects.bottom = self.rect.bottom + height//2
-        self.velocity = 6
-        self.vel_chng_rt = 200
+    def reuse(self, cactus, image):
+        """Display a new simulated cactus without allocating anything.
+
+        Args:
+            cactus (CactusState): cactus generated by the simulation
+            image (Surface): prerendered surface of the whole cactus
+        """
+        self.cactus = cactus
+        self.image = image
+        self.rect.size = image.get_size()
+        self.rect.x = cactus.left - self.game.view_scroll
+        self.rect.bottom = cactus.bottom
 
     def update(self):
-        '''Move obstacle across screen'''
-        # progress left
-        # change velocity at certain score intervals in game
-        if self.game.score % self.vel_chng_rt == 0:
-            self.velocity += 1
+        '''Move cactus across screen'''
+        # cacti stay put in the world, the screen follows the world scroll
+        self.rect.x = self.cactus.left - self.game.view_scroll
+
 
-        self.rect.x -= self.velocity
+class CactusPool(object):
+    """CactusPool recycles the sprites of cacti and birds that scrolled off screen.
 
-class Cloud(Obstacles):
-    """Clouds are inert and move across screen 
+    A cactus is one of a few hundred layouts (body height, arm heights and
+    bump sides), so the surface of every layout, and of every
+    bird, are rendered once when the pool is built and only handed out
+    afterwards. Once the pool has built enough sprites no Surface or Sprite
+    is allocated while playing.
 
     Args:
-        x (int): x location of cloud
-        y (int): y location of cloud
-        width (int): width of cloud
-        height (int): height of cloud
-        color (tuple): RGB color value of cloud
         game (Game): instance of game currently being played
+        size (int): number of cacti to build up front
 
     Attributes:
-        image (Surface): surface displayed on screen
-        rect (tuple): rectangular positioning of image
-        velo (int): movement speed across the screen
-    """    
-    def __init__(self, x, y, width, height, color, game):
-        super().__init__(x, y, width, height, color, game)
-        self.image = pg.Surface((self.width, self.height))
-        self.rect = self.image.get_rect()
-        self.image.fill(color)
-        self.rect.centerx = x
-        self.rect.centery = y
-        self.velo = 1
+        images (dict): prerendered surfaces keyed by cactus or bird layout
+        free (list): cactus sprites ready for reuse
+    """
+    def __init__(self, game, size=16):
+        self.game = game
+        self.images = {}
+        self.free = [Cactus(game) for _ in range(size)]
+        # rendering a layout the first time it spawns would cost a frame mid-game
+        for layout in levelgen.cactus_layouts():
+            self.image(simulation.CactusState(0, *layout).parts)
+        for altitude in BIRD_ALTITUDES:
+            self.image(simulation.BirdState(0, altitude).parts)
+
+    def image(self, parts):
+        """Return the surface of a cactus layout, rendering it if it is not yet.
+
+        Args:
+            parts (tuple): (x offset, bottom, width, height) of every piece of the cactus,
+                           or the single piece of a bird
+
+        Returns:
+            Surface: the whole cactus (or bird)
+        """
+        if parts not in self.images and len(parts) == 1:
+            # a bird: a triangle with its beak pointing at the block
+            _, _, width, height = parts[0]
+            image = pg.Surface((width, height))
+            image.fill(COLORKEY)
+            pg.draw.polygon(image, BLACK, [(0, height//2), (width - 1, 0), (width - 1, height - 1)],
+                            INNER_BORDER_WIDTH)
+            self.images[parts] = to_display(image, COLORKEY)
+        elif parts not in self.images:
+            top = min(bottom - height for _, bottom, _, height in parts)
+            image = pg.Surface((OBS_WIDTH + 2*ARM_WIDTH, OBS_Y_POS - top))
+            image.fill(COLORKEY)
+            pieces = [pg.Rect(dx + ARM_WIDTH, bottom - height - top, width, height)
+                      for dx, bottom, width, height in parts]
+            # pieces overlap in the same order they used to be drawn as separate sprites:
+            # body, right arm, left arm, right bump, left bump
+            for n in (0, 2, 1, 4, 3):
+                image.blit(hollow_surface(pieces[n].width, pieces[n].height, WHITE), pieces[n])
+            self.images[parts] = to_display(image, COLORKEY)
+        return self.images[parts]
+
+    def acquire(self, cactus):
+        """Hand out the sprite displaying a simulated cactus.
+
+        Args:
+            cactus (CactusState): cactus (or BirdState) generated by the simulation
+
+        Returns:
+            Cactus: sprite of the whole cactus
+        """
+        sprite = self.free.pop() if self.free else Cactus(self.game)
+        sprite.reuse(cactus, self.image(cactus.parts))
+        return sprite
+
+    def release(self, sprite):
+        '''Take back the sprite of a cactus that is no longer in play'''
+        sprite.kill()
+        sprite.cactus = None
+        self.free.append(sprite)
+
+
+class CloudLayer(object):
+    """CloudLayer is a field of clouds baked into one surface that scrolls across screen.
+
+    Clouds are composed of 14 sub clouds that wander away from a random starting
+    point. Every sub cloud is drawn once into a surface as wide as the screen,
+    which then scrolls left and wraps around, so any number of clouds costs two
+    blits per frame. Layers scrolling at different speeds give a parallax sky.
+
+    Args:
+        clouds (int): number of clouds in the layer
+        velo (float): movement speed across the screen
+        color (tuple): RGB color value of the clouds
+        rng (Random): random number generator used to place the clouds
+
+    Attributes:
+        image (Surface): surface holding the whole cloud field
+        rect (Rect): band of the screen covered by the layer
+        offset (float): distance the layer has scrolled, wrapped at WIDTH
+        previous (float): offset before the last update
+        x (int): distance the layer is drawn scrolled, see place()
+        moved (bool): True if the layer moved on screen during the last place()
+    """
+    def __init__(self, clouds, velo, color, rng=random):
+        self.velo = velo
+        self.offset = 0.0
+        self.previous = 0.0
+        self.x = 0
+        self.moved = False
+        centers = []
+        for x in range(1, clouds + 1):
+            # x placement will be somewhere within each part of WIDTH
+            x_placement = rng.randint(round((x-1)/clouds * WIDTH), round(x/clouds * WIDTH))
+            y_placement = rng.randint(50, round(1/3 * HEIGHT))
+            centers.append((x_placement, y_placement))
+            for y in range(13):
+                # position is based on position of the previous sub cloud
+                # but it is shifted either left or right and maybe up or down by CLOUD_WIDTH//2
+                x_movement = rng.choice([-1, 1])
+                # stacking zeros so that y change will only vary slightly
+                y_movement = rng.choice([-1, 0, 0, 0, 0, 0, 1])
+                x_placement += CLOUD_WIDTH//2 * x_movement
+                y_placement += CLOUD_WIDTH//2 * y_movement
+                centers.append((x_placement, y_placement))
+
+        # sub cloud rects, wrapped so the layer joins up with itself
+        rects = []
+        for x, y in centers:
+            rect = pg.Rect(0, 0, CLOUD_WIDTH, CLOUD_HEIGHT)
+            rect.center = (x, y)
+            rect.x %= WIDTH
+            rects.append(rect)
+            if rect.right > WIDTH:
+                rects.append(rect.move(-WIDTH, 0))
+        top = max(0, min(rect.top for rect in rects))
+        bottom = max(rect.bottom for rect in rects)
+        self.rect = pg.Rect(0, top, WIDTH, bottom - top)
+        image = pg.Surface(self.rect.size)
+        image.fill(COLORKEY)
+        for rect in rects:
+            image.fill(color, rect.move(0, -top))
+        self.image = to_display(image, COLORKEY)
 
     def update(self):
-        '''Move left across screen'''
-        self.rect.centerx -= self.velo
+        '''Move left across screen by one frame of the game'''
+        self.previous = self.offset
+        self.offset = (self.offset + self.velo) % WIDTH
+
+    def place(self, alpha):
+        '''Put the layer alpha of the way from where it was before the last update to where it is now'''
+        x = int((self.previous + self.velo*alpha) % WIDTH)
+        self.moved = x != self.x
+        self.x = x
+
+    def draw(self, surface):
+        '''Draw the layer, wrapping around the edge of the screen'''
+        surface.blit(self.image, (-self.x, self.rect.top))
+        surface.blit(self.image, (WIDTH - self.x, self.rect.top))
 
 
 class Block(pg.sprite.Sprite):
-    """Block is main sprite controlled by user
+    """Block is main sprite controlled by user. Its movement is worked out by
+    the game simulation, the sprite only displays it.
 
     Args:
         game (Game): instance of game currently being played
@@ -124,18 +264,13 @@ class Block(pg.sprite.Sprite):
         rect (tuple): rectangular positioning of image
         inner_border_width (int): inner border width of block
         inner_width (int): width of inner square created by border width
-        pos_orig (tuple): constant positional vector
-        pos (tuple): positional vector
-        vel (tuple): velocity vector
-        acc (tuple): acceleration vector
-
     """
     def __init__(self, game):
         pg.sprite.Sprite.__init__(self)
         self.game = game
-        self.height = 50
-        self.width = 50
-        self.image = pg.Surface((self.width, self.height))
+        self.height = BLOCK_HEIGHT
+        self.width = BLOCK_WIDTH
+        self.image = to_display(pg.Surface((self.width, self.height)))
         self.rect = self.image.get_rect()
         # Set inner rect borders so the Surface will appear hollow when filled.
         self.inner_border_width = 3
@@ -143,41 +278,9 @@ class Block(pg.sprite.Sprite):
         self.image.fill(WHITE, rect=(self.inner_border_width, 
                                      self.inner_border_width, self.inner_width, 
                                      self.inner_width))
-        self.rect.centerx = WIDTH*1//4
-        self.rect.bottom = HEIGHT - 100
-        self.pos_orig = vec(self.rect.centerx, self.rect.bottom)
-        self.pos = vec(self.rect.centerx, self.rect.bottom)
-        self.vel = vec(0, 0)
-        self.acc = vec(0, 0)
-
-    def jump(self):
-        '''Move upward'''
-        # Move sprite down one pixel and check for collision
-        self.rect.y += 1
-        # if collision occured then sprite is currently on a platform
-        hits = pg.sprite.spritecollide(self, self.game.platforms, False)
-        # Move back to original position
-        self.rect.y -= 1
-        # If on a platform, allow jump velocity (keeps from double jumping)
-        if hits:
-            self.vel.y = PLAYER_JUMP
-            self.game.jump_sound.play()
+        self.rect.centerx = BLOCK_X
+        self.rect.bottom = GROUND_Y
 
     def update(self):
-        '''Accelerate downward'''
-        self.acc = vec(0, GRAVITY)
-
-        keys = pg.key.get_pressed()
-        
-        # If holding down spacebar, it will lessen the effects of gravity
-        # giving the effect of a more forceful jump!
-        if keys[pg.K_SPACE]:
-            self.vel.y += ANTIGRAVITY
-        
-        # Acceleration affects velocity
-        self.vel += self.acc
-
-        # Position is affected by velocity and acceleration.
-        self.pos += self.vel + 0.5*self.acc
-        
-        self.rect.midbottom = self.pos
\ No newline at end of file
+        '''Move to the position of the simulated block'''
+        self.rect.bottom = self.game.view_bottom
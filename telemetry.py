@@ -0,0 +1,229 @@
+# Per-frame telemetry for balancing the game. Every frame adds one row of
+# fixed-width values (block position and velocity, jump input, score, ...)
+# to preallocated columns in memory. Full batches are handed to a writer
+# thread that appends each column to its own binary file, so recording a
+# frame costs a few array stores and never touches the disk.
+#
+# Every session appends to the same column files, next to a schema.json
+# describing them, so all the frames ever recorded can be memory-mapped as
+# NumPy arrays (`pip install numpy`) without parsing anything:
+#
+#   >>> import telemetry
+#   >>> columns = telemetry.load()
+#   >>> columns['score'][columns['frame'] == 1].size   # number of games
+#
+#   python telemetry.py telemetry
+from array import array
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+from setting import *
+from leaderboard import atomic_write
+
+SCHEMA_FILE = 'schema.json'
+SCHEMA_VERSION = 1
+# name and array typecode of every column, in the order they are recorded
+COLUMNS = (
+    ('seed', 'Q'),          # seed of the game, a new game starts where frame is 1
+    ('frame', 'I'),         # frames stepped so far
+    ('block_y', 'f'),       # y position of the bottom of the block
+    ('block_vel', 'f'),     # vertical velocity of the block
+    ('jump', 'B'),          # 1 if the jump key was held
+    ('score', 'I'),
+    ('obs_gen_time', 'H'),  # milliseconds in between groups of obstacles
+    ('speed', 'H'),         # distance the obstacles move each frame
+    ('obstacles', 'H'),     # number of obstacles in play
+)
+
+
+def numpy_dtype(typecode):
+    '''Return the NumPy dtype string of an array typecode, in the byte order of this machine'''
+    kind = 'f' if typecode in 'fd' else 'u' if typecode.isupper() else 'i'
+    return '%s%s%d' % ('<' if sys.byteorder == 'little' else '>', kind, array(typecode).itemsize)
+
+
+def schema():
+    '''Return the description of the column files written by TelemetryLog'''
+    return {'version': SCHEMA_VERSION, 'fps': FPS,
+            'columns': [{'name': name, 'dtype': numpy_dtype(typecode), 'file': name + '.bin'}
+                        for name, typecode in COLUMNS]}
+
+
+class TelemetryLog(object):
+    """TelemetryLog records one row of telemetry per frame into column files.
+
+    Rows are stored in one of two preallocated batches. When a batch is full
+    it goes to the writer thread and recording carries on in the other one.
+    If the writer is still busy with that one too (the disk has stalled for a
+    whole batch), the full batch is thrown away and counted rather than
+    making the game wait.
+
+    A crash can leave the column files with different numbers of rows. The
+    next TelemetryLog cuts them all back to the rows every column has before
+    appending to them.
+
+    Args:
+        directory (str): folder of the column files
+        batch (int): rows held in memory before they are written
+
+    Attributes:
+        directory (str): folder of the column files
+        rows (int): rows in the batch being filled
+        dropped (int): rows thrown away because the writer was too far behind
+    """
+    def __init__(self, directory=TELEMETRY_DIR, batch=TELEMETRY_BATCH):
+        self.directory = directory
+        self.batch = batch
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, SCHEMA_FILE)
+        if os.path.exists(path):
+            with open(path) as infile:
+                if json.load(infile) != schema():
+                    raise ValueError('%s was written with other columns, record to another directory' % path)
+        else:
+            atomic_write(path, json.dumps(schema(), indent=1))
+        self.trim()
+        # every column of both batches is allocated up front
+        self.free = queue.Queue()
+        for _ in range(2):
+            self.free.put([array(typecode, [0]) * batch for _, typecode in COLUMNS])
+        self.columns = self.free.get()
+        self.rows = 0
+        self.dropped = 0
+        # (columns, rows) waiting to be written, None to stop
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.writer, name='telemetry', daemon=True)
+        self.thread.start()
+
+    def trim(self):
+        '''Cut every column file back to the number of rows all of them have'''
+        paths = [(os.path.join(self.directory, name + '.bin'), array(typecode).itemsize)
+                 for name, typecode in COLUMNS]
+        rows = min(os.path.getsize(path) // size if os.path.exists(path) else 0 for path, size in paths)
+        for path, size in paths:
+            if os.path.exists(path) and os.path.getsize(path) != rows * size:
+                os.truncate(path, rows * size)
+
+    def record(self, sim, jump):
+        """Add the row of the frame just stepped.
+
+        Args:
+            sim (Simulation): game that was stepped
+            jump (bool): True if the jump key was held during the frame
+        """
+        n = self.rows
+        seed, frame, block_y, block_vel, jumps, score, obs_gen_time, speed, obstacles = self.columns
+        seed[n] = sim.seed
+        frame[n] = sim.frame
+        block_y[n] = sim.block_y
+        block_vel[n] = sim.block_vel
+        jumps[n] = jump
+        score[n] = sim.score
+        obs_gen_time[n] = sim.obs_gen_time
+        speed[n] = sim.speed
+        obstacles[n] = len(sim.obstacles)
+        self.rows = n + 1
+        if self.rows == self.batch:
+            self.flush()
+
+    def flush(self, wait=False):
+        '''Hand the rows recorded so far to the writer thread, waiting for it only if wait is True'''
+        if not self.rows:
+            return
+        try:
+            spare = self.free.get(wait)
+        except queue.Empty:
+            # both batches are waiting on the disk, lose this one instead of waiting
+            self.dropped += self.rows
+            self.rows = 0
+            return
+        self.queue.put((self.columns, self.rows))
+        self.columns = spare
+        self.rows = 0
+
+    def writer(self):
+        '''Background thread: append every column of each batch to its file'''
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            columns, rows = item
+            for (name, _), column in zip(COLUMNS, columns):
+                with open(os.path.join(self.directory, name + '.bin'), 'ab') as outfile:
+                    # one write per column per batch, straight from the array's memory
+                    outfile.write(memoryview(column)[:rows])
+            self.free.put(columns)
+
+    def close(self):
+        '''Write every row recorded so far and stop the writer thread'''
+        self.flush(wait=True)
+        self.queue.put(None)
+        self.thread.join()
+
+
+def load(directory=TELEMETRY_DIR):
+    """Memory-map every column written to a directory as a NumPy array.
+
+    Nothing is read until the arrays are used, and columns are cut to the
+    number of rows all of them have, so a session still being written (or
+    cut short by a crash) can be read too. This requires NumPy.
+
+    Args:
+        directory (str): folder of the column files
+
+    Returns:
+        dict: read-only array of every column keyed by name, all of the same length
+
+    Raises:
+        ValueError: if the directory holds no telemetry this version can read
+    """
+    # only the reader needs NumPy, the game itself does not
+    import numpy as np
+    path = os.path.join(directory, SCHEMA_FILE)
+    if not os.path.exists(path):
+        raise ValueError('%s has no %s, it holds no telemetry' % (directory, SCHEMA_FILE))
+    with open(path) as infile:
+        description = json.load(infile)
+    if description.get('version') != SCHEMA_VERSION:
+        raise ValueError('%s is not version %d telemetry' % (path, SCHEMA_VERSION))
+    files = []
+    for column in description['columns']:
+        file_path = os.path.join(directory, column['file'])
+        dtype = np.dtype(column['dtype'])
+        size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+        files.append((column['name'], file_path, dtype, size // dtype.itemsize))
+    rows = min(count for _, _, _, count in files)
+    columns = {}
+    for name, file_path, dtype, _ in files:
+        if rows:
+            columns[name] = np.memmap(file_path, dtype=dtype, mode='r', shape=(rows,))
+        else:
+            # an empty file cannot be mapped
+            columns[name] = np.zeros(0, dtype=dtype)
+    return columns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize BLOCK RUN telemetry.')
+    parser.add_argument('directory', nargs='?', default=TELEMETRY_DIR, help='folder of the column files')
+    args = parser.parse_args(argv)
+
+    columns = load(args.directory)
+    frames = len(columns['frame'])
+    games = int((columns['frame'] == 1).sum())
+    print('%d frames (%.1f minutes of play), %d games' % (frames, frames / FPS / 60, games))
+    if not frames:
+        return 0
+    print('%-14s %12s %12s %12s' % ('column', 'min', 'mean', 'max'))
+    for name, _ in COLUMNS:
+        values = columns[name]
+        print('%-14s %12.6g %12.6g %12.6g' % (name, values.min(), values.mean(), values.max()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# Text drawing with cached fonts and rendered text.
+from collections import OrderedDict
+import pygame as pg
+from assets import to_display
+
+DIGITS = '0123456789'
+
+
+class TextRenderer(object):
+    """TextRenderer draws text without loading fonts or rendering text it has seen before.
+
+    Fonts are kept per (name, size), rendered text is kept in a least recently
+    used cache, and the digits of every (name, size, color) are rendered once
+    into an atlas so numbers like the score are drawn by blitting glyphs.
+
+    Args:
+        cache_size (int): number of rendered text surfaces to keep
+
+    Attributes:
+        fonts (dict): loaded fonts keyed by (name, size)
+        surfaces (OrderedDict): rendered text keyed by (text, name, size, color), oldest first
+        atlases (dict): list of digit glyphs keyed by (name, size, color)
+        cache_size (int): number of rendered text surfaces to keep
+    """
+    def __init__(self, cache_size=64):
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.atlases = {}
+        self.cache_size = cache_size
+
+    def font(self, name, size):
+        '''Return the font for a name and size, loading it the first time'''
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = self.fonts[key] = pg.font.Font(name, size)
+        return font
+
+    def render(self, text, name, size, color):
+        """Return a surface with the text on it.
+
+        Args:
+            text (str): Text to be rendered
+            name (str): file name of the font
+            size (int): Font size of text
+            color (tuple): RGB color value of text
+
+        Returns:
+            Surface: the rendered text
+        """
+        key = (text, name, size, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = self.font(name, size).render(text, False, color)
+        # rendered text is 8 bit, converting it once saves a conversion on every blit
+        surface = self.surfaces[key] = to_display(surface, surface.get_colorkey())
+        if len(self.surfaces) > self.cache_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def digits(self, name, size, color):
+        '''Return the ten rendered digit glyphs for a font and color'''
+        key = (name, size, color)
+        glyphs = self.atlases.get(key)
+        if glyphs is None:
+            font = self.font(name, size)
+            glyphs = [font.render(digit, False, color) for digit in DIGITS]
+            glyphs = self.atlases[key] = [to_display(glyph, glyph.get_colorkey()) for glyph in glyphs]
+        return glyphs
+
+    def draw_number(self, surface, number, name, size, color, x, y):
+        """Draw a string of digits by blitting glyphs from the digit atlas.
+
+        Args:
+            surface (Surface): surface to draw on
+            number (str): digits to draw
+            name (str): file name of the font
+            size (int): Font size of the digits
+            color (tuple): RGB color value of the digits
+            x (int): x position of the left of the number
+            y (int): y position of the vertical center of the number
+
+        Returns:
+            Rect: area of the surface covered by the number
+        """
+        glyphs = self.digits(name, size, color)
+        height = glyphs[0].get_height()
+        top = y - height//2
+        left = x
+        for digit in number:
+            glyph = glyphs[ord(digit) - 48]
+            surface.blit(glyph, (x, top))
+            x += glyph.get_width()
+        return pg.Rect(left, top, x - left, height)
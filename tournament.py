@@ -0,0 +1,220 @@
+# Tournaments: many seeded games played by bots across every CPU core, with
+# settings overridden per run to sweep the difficulty. Results stream back as
+# games finish and survival times are aggregated as they arrive.
+#
+#   python tournament.py --policy reflex --seeds 1000 --set GRAVITY=0.7,0.8,0.9 --set OBS_VELOCITY=6,8
+#
+# A policy is a function that takes the seed of a game and returns a function
+# deciding from the Simulation whether to hold the jump key on each frame.
+# Policies other than the built-in ones are given as module:function.
+import argparse
+import importlib
+import itertools
+import json
+import multiprocessing
+import sys
+import time
+from setting import *
+from simulation import RULES, Simulation, make_rng
+from jumparc import Autopilot
+
+# settings given on the command line are turned into the type of their default
+RULE_TYPES = {name: type(value) for name, value in RULES.items()}
+# lower case names accepted for the settings
+RULE_NAMES = {name.lower(): name for name in RULES}
+RULE_NAMES.update({'velocity': 'OBS_VELOCITY', 'vel_chng_rt': 'OBS_VEL_CHNG_RT'})
+
+
+def idle_policy(seed):
+    '''Never jump'''
+    return lambda sim: False
+
+
+def random_policy(seed):
+    '''Press jump on a random 5% of frames'''
+    rng = make_rng(seed, 'policy')
+    return lambda sim: rng.random() < 0.05
+
+
+def reflex_policy(seed):
+    '''Hold jump while a cactus is less than a few frames away'''
+    def policy(sim):
+        front = BLOCK_X + BLOCK_WIDTH//2 + sim.scroll
+        return bool(sim.nearby(front - BLOCK_WIDTH, front + 8*sim.speed))
+    return policy
+
+
+def autopilot_policy(seed):
+    '''Plan every jump with the jump arc table, see jumparc.Autopilot'''
+    return Autopilot()
+
+
+POLICIES = {
+    'idle': idle_policy,
+    'random': random_policy,
+    'reflex': reflex_policy,
+    'autopilot': autopilot_policy,
+}
+
+
+def load_policy(name):
+    '''Return the policy registered under name, or the function named by module:function'''
+    if name in POLICIES:
+        return POLICIES[name]
+    module, sep, function = name.partition(':')
+    if not sep:
+        raise ValueError('unknown policy %r, use one of %s or module:function' % (name, ', '.join(POLICIES)))
+    return getattr(importlib.import_module(module), function)
+
+
+def parse_sweep(assignments):
+    """Turn NAME=value,value,... assignments into every combination of the values.
+
+    Args:
+        assignments (list): strings like 'GRAVITY=0.7,0.8'
+
+    Returns:
+        list: one dict of settings overrides per combination
+    """
+    names = []
+    choices = []
+    for assignment in assignments or ():
+        name, sep, values = assignment.partition('=')
+        name = RULE_NAMES.get(name.lower(), name)
+        if not sep or name not in RULES:
+            raise ValueError('cannot sweep %r, use NAME=value,... with one of %s' % (assignment, ', '.join(RULES)))
+        names.append(name)
+        choices.append([RULE_TYPES[name](value) for value in values.split(',')])
+    return [dict(zip(names, values)) for values in itertools.product(*choices)]
+
+
+def play(task):
+    """Play one game to the end (or to max_frames). Runs in a worker process.
+
+    Args:
+        task (tuple): (policy name, settings overrides, seed, max_frames)
+
+    Returns:
+        dict: the task and how the game went
+    """
+    name, rules, seed, max_frames = task
+    sim = Simulation(seed, rules)
+    policy = load_policy(name)(seed)
+    step = sim.step
+    while sim.frame < max_frames and step(policy(sim)):
+        pass
+    return {'policy': name, 'rules': rules, 'seed': seed, 'frames': sim.frame,
+            'score': sim.score, 'finished': not sim.playing, 'uncleared': sim.uncleared}
+
+
+class Survival(object):
+    """Survival aggregates how long games lasted, one game at a time.
+
+    Frame counts go into a histogram with one bucket per second of game time,
+    so percentiles cost the same no matter how many games were added.
+
+    Attributes:
+        runs (int): number of games added
+        total (int): frames played over all games
+        longest (int): frames played by the longest game
+        capped (int): games stopped by max_frames before they ended
+        uncleared (int): games in which the level generator handed out a group no jump gets past
+        buckets (list): number of games per whole second survived
+    """
+    def __init__(self):
+        self.runs = 0
+        self.total = 0
+        self.longest = 0
+        self.capped = 0
+        self.uncleared = 0
+        self.buckets = []
+
+    def add(self, result):
+        '''Add the result of one game'''
+        frames = result['frames']
+        self.runs += 1
+        self.total += frames
+        self.longest = max(self.longest, frames)
+        self.capped += not result['finished']
+        self.uncleared += bool(result['uncleared'])
+        bucket = frames // FPS
+        if bucket >= len(self.buckets):
+            self.buckets.extend([0] * (bucket + 1 - len(self.buckets)))
+        self.buckets[bucket] += 1
+
+    def mean(self):
+        '''Return the mean survival time in seconds'''
+        return self.total / self.runs / FPS if self.runs else 0.0
+
+    def percentile(self, q):
+        '''Return the q-th percentile survival time in whole seconds'''
+        rank = q / 100 * self.runs
+        seen = 0
+        for seconds, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return seconds
+        return 0
+
+    def summary(self):
+        '''Return the aggregate as a dict'''
+        return {'runs': self.runs, 'mean_s': round(self.mean(), 2), 'p50_s': self.percentile(50),
+                'p90_s': self.percentile(90), 'p99_s': self.percentile(99),
+                'max_s': round(self.longest / FPS, 2), 'capped': self.capped,
+                'uncleared': self.uncleared}
+
+
+def describe(rules):
+    '''Return settings overrides as a short string'''
+    return ' '.join('%s=%s' % item for item in sorted(rules.items())) or 'defaults'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play many BLOCK RUN games with bots on every CPU core.')
+    parser.add_argument('--policy', action='append',
+                        help='bot to play with: %s or module:function (default reflex)' % ', '.join(POLICIES))
+    parser.add_argument('--seeds', type=int, default=100, help='games per policy and settings combination')
+    parser.add_argument('--first-seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--set', action='append', metavar='NAME=VALUES',
+                        help='comma separated values of a setting to sweep (%s)' % ', '.join(RULES))
+    parser.add_argument('--max-frames', type=int, default=FPS * 600, help='stop games that last longer')
+    parser.add_argument('--processes', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--output', help='file to write every result to, one JSON line per game')
+    args = parser.parse_args(argv)
+
+    policies = args.policy or ['reflex']
+    for name in policies:
+        load_policy(name)
+    sweep = parse_sweep(args.set)
+    tasks = [(name, rules, seed, args.max_frames)
+             for name in policies for rules in sweep
+             for seed in range(args.first_seed, args.first_seed + args.seeds)]
+
+    results = {}
+    outfile = open(args.output, 'w') if args.output else None
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        # unordered, so results are aggregated as soon as any worker finishes a game
+        chunksize = max(1, len(tasks) // (4 * (args.processes or multiprocessing.cpu_count())))
+        for done, result in enumerate(pool.imap_unordered(play, tasks, chunksize), 1):
+            key = (result['policy'], describe(result['rules']))
+            results.setdefault(key, Survival()).add(result)
+            if outfile is not None:
+                outfile.write(json.dumps(result) + '\n')
+            if done % 100 == 0 or done == len(tasks):
+                sys.stderr.write('\r%d/%d games  %.1f s' % (done, len(tasks), time.perf_counter() - start))
+    sys.stderr.write('\n')
+    if outfile is not None:
+        outfile.close()
+
+    print('%-10s %-40s %6s %8s %6s %6s %6s %8s %6s %9s' % (
+        'policy', 'settings', 'runs', 'mean s', 'p50', 'p90', 'p99', 'max s', 'capped', 'uncleared'))
+    for (name, rules), survival in sorted(results.items()):
+        summary = survival.summary()
+        print('%-10s %-40s %6d %8.2f %6d %6d %6d %8.2f %6d %9d' % (
+            name, rules, summary['runs'], summary['mean_s'], summary['p50_s'], summary['p90_s'],
+            summary['p99_s'], summary['max_s'], summary['capped'], summary['uncleared']))
+
+
+if __name__ == '__main__':
+    main()